@@ -51,10 +51,11 @@ def main():
             pygit.checkout(sys.argv[3], create_new=True)
         else:
             pygit.checkout(sys.argv[2])
-        pygit.checkout(sys.argv[2])
 
     elif command == "diff":
         pygit.index.diff()
+    elif command == "gc":
+        pygit.objects.pack_loose()
     elif command == "remote":
         if len(sys.argv) < 3:
             print("Usage: pygit remote <add|list> [<name> <url>]")
@@ -1,13 +1,18 @@
 import os
+import shutil
 import time
-import json
-from collections import defaultdict
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
 
-from .objects import PyGitObjects
+from .objects import PyGitObjects, STREAM_CHUNK_SIZE
 from .index import PyGitIndex
 from .remote import PyGitRemote
 from .ignore import PyGitIgnore
 from .user import PyGitUser
+from .utils import stat_key
+
+# Upper bound on parent directory descriptors held open during a checkout
+MAX_DIR_FDS = 256
 
 class PyGit:
     def __init__(self, root_path='.'):
@@ -19,6 +24,13 @@ class PyGit:
         self.refs_heads_dir = os.path.join(self.refs_dir, 'heads')
         self.index_file = os.path.join(self.pygit_dir, 'index')
         self.head_file = os.path.join(self.pygit_dir, 'HEAD')
+        self.current_commit_file = os.path.join(self.pygit_dir, 'current_commit')
+        
+        # Flush checked-out files and their directories to disk (slower)
+        self.durable = False
+        
+        # Resolved HEAD, see _read_head; reset whenever HEAD or a ref is written
+        self._head_cache = None
         
         # Initialize sub-components
         self.objects = PyGitObjects(self)
@@ -39,8 +51,7 @@ class PyGit:
         os.makedirs(self.refs_heads_dir)
         
         # Create empty index
-        with open(self.index_file, 'w') as f:
-            json.dump({}, f)
+        self.index._save_index({})
         
         # Set up HEAD to point to master branch
         with open(self.head_file, 'w') as f:
@@ -50,35 +61,48 @@ class PyGit:
     
     def _get_current_branch(self):
         """Get the name of the current branch"""
-        if not os.path.exists(self.head_file):
-            return None
-            
-        with open(self.head_file, 'r') as f:
-            head = f.read().strip()
-            
-        if head.startswith('ref: refs/heads/'):
-            return head[16:]  # Extract branch name
-        else:
-            return None  # Detached HEAD
+        return self._read_head()[0]
     
     def _get_head_commit(self):
         """Get the commit hash pointed to by HEAD"""
-        if not os.path.exists(self.head_file):
-            return None
-            
-        with open(self.head_file, 'r') as f:
-            head = f.read().strip()
-            
+        return self._read_head()[1]
+    
+    def _read_head(self):
+        """
+        Resolve HEAD to (branch, commit_sha).
+        
+        The result is cached and only re-read when HEAD or the branch ref it
+        points to changes on disk. branch is None for a detached HEAD and
+        commit_sha is None if the branch has no commits yet.
+        """
+        head_key = stat_key(self.head_file)
+        if head_key is None:
+            return None, None
+        
+        # Cache layout: (HEAD stat, HEAD contents, ref stat, commit sha)
+        cache = self._head_cache
+        if cache is None or cache[0] != head_key:
+            with open(self.head_file, 'r') as f:
+                cache = (head_key, f.read().strip(), None, None)
+        head = cache[1]
+        
         if head.startswith('ref:'):
             # HEAD points to a branch
             ref_path = os.path.join(self.pygit_dir, head[5:])
-            if os.path.exists(ref_path):
+            ref_key = stat_key(ref_path)
+            if ref_key is None:
+                cache = (head_key, head, None, None)
+            elif ref_key != cache[2]:
                 with open(ref_path, 'r') as f:
-                    return f.read().strip()
-            return None
+                    cache = (head_key, head, ref_key, f.read().strip())
+            commit_sha = cache[3]
         else:
             # Detached HEAD
-            return head
+            commit_sha = head
+        
+        self._head_cache = cache
+        branch = head[16:] if head.startswith('ref: refs/heads/') else None
+        return branch, commit_sha
     
     def branch(self, name=None):
         """Create a new branch or list existing branches"""
@@ -90,22 +114,21 @@ class PyGit:
                 return
                 
             branch_path = os.path.join(self.refs_heads_dir, name)
-            if os.path.exists(branch_path):
+            try:
+                with open(branch_path, 'x') as f:
+                    f.write(commit_sha)
+            except FileExistsError:
                 print(f"Branch '{name}' already exists")
                 return
                 
-            with open(branch_path, 'w') as f:
-                f.write(commit_sha)
-                
             print(f"Created branch '{name}' pointing to {commit_sha[:7]}")
         else:
             # List branches
             current = self._get_current_branch()
-            if not os.path.exists(self.refs_heads_dir):
-                print("No branches exist yet")
-                return
-                
-            branches = os.listdir(self.refs_heads_dir)
+            try:
+                branches = os.listdir(self.refs_heads_dir)
+            except FileNotFoundError:
+                branches = []
             if not branches:
                 print("No branches exist yet")
                 return
@@ -117,24 +140,32 @@ class PyGit:
     def checkout(self, target, create_new=False):
         """Switch branches or restore working tree files"""
         # Check if target is a branch
+        branch_path = os.path.join(self.refs_heads_dir, target)
         if create_new:
-            branch_path = os.path.join(self.refs_heads_dir, target)
-            if os.path.exists(branch_path):
+            try:
+                with open(branch_path, 'x') as f:
+                    f.write(self._get_head_commit())
+            except FileExistsError:
                 print(f"Branch '{target}' already exists")
                 return
-            else:
-                with open(branch_path, 'w') as f:
-                    f.write(self._get_head_commit())
+            is_branch = True
         else:
-            branch_path = os.path.join(self.refs_heads_dir, target)
-            if os.path.exists(branch_path):
-                # It's a branch, update HEAD to point to it
-                with open(self.head_file, 'w') as f:
-                    f.write(f"ref: refs/heads/{target}")
-                
+            # Remember where HEAD was before it gets repointed
+            previous_commit = self._get_head_commit()
+            
+            try:
                 # Get the commit this branch points to
                 with open(branch_path, 'r') as f:
                     commit_sha = f.read().strip()
+                is_branch = True
+            except FileNotFoundError:
+                is_branch = False
+            
+            if is_branch:
+                # It's a branch, update HEAD to point to it
+                with open(self.head_file, 'w') as f:
+                    f.write(f"ref: refs/heads/{target}")
+                self._head_cache = None
             else:
                 # Check if it's a commit SHA
                 try:
@@ -144,14 +175,20 @@ class PyGit:
                     # Update HEAD to point directly to this commit (detached HEAD)
                     with open(self.head_file, 'w') as f:
                         f.write(commit_sha)
+                    self._head_cache = None
                 except:
                     print(f"Error: '{target}' is not a branch or commit")
                     return
             
-            # Now update the working directory to match this commit
-            self._update_working_directory(commit_sha)
+            # Now update the working directory to match this commit, unless
+            # it was already checked out from it and no tracked file has
+            # been touched since
+            if (commit_sha != previous_commit
+                    or self._get_checked_out_commit() != commit_sha
+                    or not self._index_matches_working_tree()):
+                self._update_working_directory(commit_sha)
         
-        if os.path.exists(branch_path):
+        if is_branch:
             print(f"Switched to branch '{target}'")
         else:
             print(f"HEAD is now at {commit_sha[:7]}")
@@ -177,85 +214,349 @@ class PyGit:
             print("Invalid commit: no tree found")
             return
         
-        # Clear tracked files that might have changed
-        index = self.index._load_index()
-        for path in index:
+        # Flatten the target tree into {path: (sha, mode)}
+        try:
+            target = self._read_tree(tree_sha)
+        except Exception as e:
+            print(f"Error reading tree {tree_sha}: {e}")
+            return
+        
+        # Diff against the currently checked-out state so only the delta is touched
+        old_index = self.index._load_index()
+        to_delete = old_index.keys() - target.keys()
+        
+        # Remove tracked files that don't exist in the target commit first,
+        # so a file that became a directory is already out of the way
+        complete = True
+        deleted_from = set()
+        for path in to_delete:
             abs_path = os.path.join(self.root_path, path)
-            if os.path.exists(abs_path) and not os.path.isdir(abs_path):
-                try:
-                    os.remove(abs_path)
-                except Exception as e:
-                    print(f"Warning: Could not remove file {path}: {e}")
+            try:
+                os.remove(abs_path)
+                deleted_from.add(os.path.dirname(abs_path))
+            except (FileNotFoundError, IsADirectoryError):
+                pass
+            except Exception as e:
+                print(f"Warning: Could not remove file {path}: {e}")
+                complete = False
         
         # New index for the checked-out state
         new_index = {}
         
-        # Recursively populate the working directory
-        self._populate_working_dir('', tree_sha, new_index)
+        # Write added and modified files, carrying unchanged entries over
+        if not self._populate_working_dir(target, old_index, new_index):
+            complete = False
+        
+        if self.durable:
+            self._sync_dirs(deleted_from, {})
         
         # Save the new index
         self.index._save_index(new_index)
+        
+        # Record which commit the working directory now reflects, but only
+        # if it fully does, so a partly failed checkout is retried
+        if complete:
+            with open(self.current_commit_file, 'w') as f:
+                f.write(commit_sha)
+                if self.durable:
+                    f.flush()
+                    os.fsync(f.fileno())
+        else:
+            try:
+                os.remove(self.current_commit_file)
+            except FileNotFoundError:
+                pass
+        
+        if self.durable:
+            self._sync_dirs([self.pygit_dir], {})
     
-    def _populate_working_dir(self, prefix, tree_sha, index):
-        """Recursively populate the working directory from a tree object"""
+    def _get_checked_out_commit(self):
+        """Get the commit the working directory was last populated from"""
         try:
+            with open(self.current_commit_file, 'r') as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return None
+    
+    def _index_matches_working_tree(self):
+        """Check that every index entry still matches its working tree file's stat"""
+        for path, entry in self.index._load_index().items():
+            try:
+                stat = os.stat(os.path.join(self.root_path, path))
+            except OSError:
+                return False
+            if not self.index._stat_matches(entry, stat):
+                return False
+        return True
+    
+    def _read_tree(self, tree_sha):
+        """
+        Flatten a tree object and its subtrees into {path: (sha, mode)}.
+        
+        Subtrees are walked iteratively from an explicit worklist. Errors
+        reading any tree are raised rather than skipped, so callers never
+        act on a partial listing.
+        """
+        entries = {}
+        join = os.path.join
+        pending = deque([('', tree_sha)])
+        while pending:
+            prefix, tree_sha = pending.popleft()
             _, tree_data = self.objects.get_object(tree_sha, 'tree')
             # Process binary tree data instead of decoding to text
+            tree_view = memoryview(tree_data)
+            tree_len = len(tree_data)
             ptr = 0
-            while ptr < len(tree_data):
+            while ptr < tree_len:
                 # Find the next null byte which separates the mode/name from the SHA
                 null_pos = tree_data.find(b'\x00', ptr)
                 if null_pos == -1:
                     break
                 
-                # Parse mode and filename from the header
-                header = tree_data[ptr:null_pos]
-                space_pos = header.find(b' ')
+                # Split the "<mode> <name>" header without copying it out first
+                space_pos = tree_data.find(b' ', ptr, null_pos)
                 if space_pos == -1:
                     ptr = null_pos + 21
                     continue
                 
-                mode = header[:space_pos].decode('utf-8')
-                name = header[space_pos+1:].decode('utf-8', errors='replace')
-                obj_sha = tree_data[null_pos+1:null_pos+21].hex()
+                obj_sha = tree_view[null_pos+1:null_pos+21].hex()
+                mode_prefix = tree_data[ptr:ptr+2]
                 
                 # Handle the entry based on its type (determined by mode)
-                if mode.startswith('10'):
+                if mode_prefix == b'10':
                     # Regular file (blob)
-                    file_path = os.path.join(prefix, name) if prefix else name
-                    abs_path = os.path.join(self.root_path, file_path)
-                    
-                    # Create parent directories if needed
-                    os.makedirs(os.path.dirname(abs_path), exist_ok=True)
-                    
-                    # Get the file content and write it
-                    try:
-                        _, blob_data = self.objects.get_object(obj_sha, 'blob')
-                        
-                        # Write the file with correct permissions
-                        mode_int = int(mode, 8)
-                        flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
-                        fd = os.open(abs_path, flags, mode_int)
-                        with os.fdopen(fd, 'wb') as f:
-                            f.write(blob_data)
-                            
-                        # Update the index
-                        stat = os.stat(abs_path)
-                        index[file_path] = {
-                            'sha1': obj_sha,
-                            'mtime': stat.st_mtime,
-                            'size': stat.st_size,
-                            'mode': stat.st_mode
-                        }
-                    except Exception as e:
-                        print(f"Error processing blob {obj_sha} at {file_path}: {e}")
+                    name = tree_data[space_pos+1:null_pos].decode('utf-8', errors='replace')
+                    file_path = join(prefix, name) if prefix else name
+                    entries[file_path] = (obj_sha, int(tree_data[ptr:space_pos], 8))
                 
-                elif mode.startswith('40'):
-                    # Directory (tree)
-                    new_prefix = os.path.join(prefix, name) if prefix else name
-                    self._populate_working_dir(new_prefix, obj_sha, index)
+                elif mode_prefix == b'40':
+                    # Directory (tree), walked on a later iteration
+                    name = tree_data[space_pos+1:null_pos].decode('utf-8', errors='replace')
+                    pending.append((join(prefix, name) if prefix else name, obj_sha))
                 
                 ptr = null_pos + 21  # Move to next entry (20-byte SHA + 1-byte null)
         
+        return entries
+    
+    def _populate_working_dir(self, entries, old_index, index):
+        """
+        Write the files of a flattened tree into the working directory.
+        
+        Files whose entry in old_index already has the target SHA and whose
+        size and mtime on disk still match that entry are left untouched.
+        The remaining blobs are decompressed and written on a thread pool,
+        opened relative to a descriptor of their parent directory.
+        
+        Returns:
+            bool: True if every file was written, False if any failed
+        """
+        root_path = self.root_path
+        use_dir_fd = os.open in os.supports_dir_fd
+        made_dirs = set()
+        new_dir_parents = set()
+        dir_fds = {}
+        tasks = []
+        complete = True
+        try:
+            for file_path, (obj_sha, mode_int) in entries.items():
+                abs_path = os.path.join(root_path, file_path)
+                
+                if self._is_unchanged(abs_path, old_index.get(file_path), obj_sha, mode_int):
+                    # Working tree file already has the target content
+                    index[file_path] = old_index[file_path]
+                    continue
+                
+                # Create parent directories if needed, once per directory
+                parent = os.path.dirname(abs_path)
+                if parent not in made_dirs:
+                    try:
+                        created = self._make_parent_dirs(parent, old_index)
+                    except Exception as e:
+                        print(f"Error creating directory for {file_path}: {e}")
+                        complete = False
+                        continue
+                    made_dirs.add(parent)
+                    # A new directory's own entry lives in its parent
+                    new_dir_parents.update(os.path.dirname(path) for path in created)
+                    # Keep the number of open directory descriptors bounded
+                    if use_dir_fd and len(dir_fds) < MAX_DIR_FDS:
+                        dir_fds[parent] = os.open(parent, os.O_RDONLY | os.O_DIRECTORY)
+                
+                tasks.append((file_path, abs_path, dir_fds.get(parent), obj_sha, mode_int))
+            
+            if not tasks:
+                return complete
+            
+            # zlib and file writes release the GIL, so blobs can be written in parallel
+            workers = min(32, (os.cpu_count() or 1) * 4, len(tasks))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for file_path, entry in executor.map(self._write_blob, tasks):
+                    if entry is not None:
+                        index[file_path] = entry
+                    else:
+                        complete = False
+            
+            if self.durable:
+                self._sync_dirs(made_dirs | new_dir_parents, dir_fds)
+            return complete
+        finally:
+            for dir_fd in dir_fds.values():
+                os.close(dir_fd)
+    
+    def _make_parent_dirs(self, parent, tracked):
+        """
+        Create a file's parent directories, clearing tracked files in their way.
+        
+        A path that was a file in the previous checkout may be a directory
+        in the target tree, so a tracked non-directory found where one of
+        the directories belongs is removed first. Anything else in the way
+        is left alone and reported as a conflict.
+        
+        Args:
+            parent: Absolute path of the directory to create
+            tracked: The paths of the previous checkout
+            
+        Returns:
+            list: The directories that had to be created, outermost first
+            
+        Raises:
+            Exception: If an untracked file is in the way
+        """
+        # Walk up to the nearest existing directory, noting the topmost
+        # non-directory on the way
+        missing = []
+        blocker = None
+        path = parent
+        while len(path) > len(self.root_path) and not os.path.isdir(path):
+            missing.append(path)
+            if os.path.lexists(path):
+                blocker = path
+            path = os.path.dirname(path)
+        
+        if not missing:
+            return missing
+        if blocker is not None:
+            rel_path = os.path.relpath(blocker, self.root_path)
+            if rel_path not in tracked:
+                raise Exception(f"untracked file '{rel_path}' is in the way")
+            os.remove(blocker)
+        os.makedirs(parent, exist_ok=True)
+        missing.reverse()
+        return missing
+    
+    def _clear_empty_dirs(self, abs_path):
+        """
+        Remove a directory tree left where a file now belongs.
+        
+        Only empty directories are removed; a directory that still holds
+        files raises OSError so untracked work is never deleted.
+        
+        Args:
+            abs_path: Absolute path of the directory
+        """
+        for dir_path, _, _ in os.walk(abs_path, topdown=False):
+            os.rmdir(dir_path)
+    
+    def _sync_dirs(self, dirs, dir_fds):
+        """
+        Persist the directory entries of a durable checkout.
+        
+        Each file is fsynced by the worker that wrote it; this then fsyncs
+        every directory whose entries changed once, so new, replaced and
+        deleted names survive a crash too. Only this checkout's files and
+        directories are flushed, not every filesystem on the host as
+        os.sync would.
+        
+        Args:
+            dirs: The directories whose entries changed
+            dir_fds: Already open descriptors for some of those directories
+        """
+        if not hasattr(os, 'O_DIRECTORY'):
+            return
+        
+        for path in dirs:
+            dir_fd = dir_fds.get(path)
+            if dir_fd is not None:
+                os.fsync(dir_fd)
+                continue
+            dir_fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+    
+    def _write_blob(self, task):
+        """
+        Write a single blob into the working directory.
+        
+        Args:
+            task: A (file_path, abs_path, dir_fd, obj_sha, mode) tuple; when
+                dir_fd is not None the file is opened relative to it
+            
+        Returns:
+            tuple: (file_path, index entry), with None as the entry on failure
+        """
+        file_path, abs_path, dir_fd, obj_sha, mode_int = task
+        try:
+            # Stream the blob so large files are never held in memory whole
+            with self.objects.open_object(obj_sha, 'blob') as src:
+                # Write the file with correct permissions
+                fd = self._create_file(abs_path, dir_fd, mode_int)
+                with os.fdopen(fd, 'wb') as f:
+                    shutil.copyfileobj(src, f, STREAM_CHUNK_SIZE)
+                    f.flush()
+                    if self.durable:
+                        os.fsync(f.fileno())
+                    # Stat the open file rather than resolving the path again
+                    stat = os.fstat(f.fileno())
+                
+            # Build the index entry
+            return file_path, self.index._make_entry(obj_sha, stat)
         except Exception as e:
-            print(f"Error processing tree {tree_sha}: {e}")
+            print(f"Error processing blob {obj_sha} at {file_path}: {e}")
+            return file_path, None
+    
+    def _create_file(self, abs_path, dir_fd, mode_int):
+        """
+        Create a working tree file for writing, replacing any existing one.
+        
+        Truncating an existing file would keep its old permission bits, so
+        it is unlinked and created again instead, as Git does. The new file
+        gets the tree's mode with the umask applied by the kernel.
+        
+        Args:
+            abs_path: Absolute path of the file
+            dir_fd: Descriptor of the parent directory to open relative
+                to, or None
+            mode_int: The file mode recorded in the tree
+            
+        Returns:
+            int: A descriptor of the new file, open for writing
+        """
+        if dir_fd is None:
+            name, kwargs = abs_path, {}
+        else:
+            name, kwargs = os.path.basename(abs_path), {'dir_fd': dir_fd}
+        
+        flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL
+        try:
+            return os.open(name, flags, mode_int, **kwargs)
+        except FileExistsError:
+            if os.path.isdir(abs_path) and not os.path.islink(abs_path):
+                # A directory in the previous checkout is a file here
+                self._clear_empty_dirs(abs_path)
+            else:
+                os.unlink(name, **kwargs)
+        return os.open(name, flags, mode_int, **kwargs)
+    
+    def _is_unchanged(self, abs_path, entry, obj_sha, mode_int):
+        """Check if a working tree file still matches an index entry for obj_sha and mode_int"""
+        if not entry or entry['sha1'] != obj_sha or entry.get('mode') != mode_int:
+            return False
+        
+        try:
+            stat = os.stat(abs_path)
+        except OSError:
+            return False
+        
+        return self.index._stat_matches(entry, stat)
@@ -1,6 +1,13 @@
 import os
 import fnmatch
+import functools
 import re
+from .utils import norm_path
+
+try:
+    import re2
+except ImportError:
+    re2 = None
 
 class PyGitIgnore:
     """
@@ -17,81 +24,162 @@ class PyGitIgnore:
         """
         self.pygit = pygit_instance
         self.ignore_patterns = []
-        self._load_ignore_patterns()
+        self._literal_dirs = set()
+        self._combined_pattern = None
+        self._pattern_set = None
+        # Cache per instance; decorating the method would share one cache
+        # across all instances and keep every instance alive
+        self._is_ignored_cached = functools.lru_cache(maxsize=65536)(self._is_ignored)
+        # Patterns are read and compiled on first use, so commands that
+        # never check a path don't pay for it
+        self._loaded = False
     
     def _load_ignore_patterns(self):
         """
         Load ignore patterns from .pygitignore files.
         Looks for .pygitignore in the repository root.
         """
-        # Reset patterns
+        # Reset patterns and any results computed from the old ones
         self.ignore_patterns = []
+        self._literal_dirs = set()
+        self._is_ignored_cached.cache_clear()
+        
+        # Patterns that still need regex matching after the literal check
+        regex_patterns = []
         
         # Check for .pygitignore in the root directory
         ignore_file = os.path.join(self.pygit.root_path, '.pygitignore')
-        if os.path.exists(ignore_file):
-          #  print(f"Loading ignore patterns from {ignore_file}")
+        try:
             with open(ignore_file, 'r') as f:
-                for line_num, line in enumerate(f, 1):
-                    # Remove comments and whitespace
-                    line = line.split('#')[0].strip()
-                    if line:
-                        try:
-                            # Convert the glob pattern to a regex pattern
-                            pattern = self._glob_to_regex(line)
-                            self.ignore_patterns.append(pattern)
-                        except Exception as e:
-                            print(f"Error processing line {line_num}: {line} - {str(e)}")
+                lines = f.readlines()
+        except FileNotFoundError:
+            lines = []
+        
+        for line_num, line in enumerate(lines, 1):
+            # Remove comments and whitespace
+            line = line.split('#')[0].strip()
+            if line:
+                try:
+                    # Convert the glob pattern to a regex pattern
+                    pattern, is_dir_only, is_anchored = self._glob_to_regex(line)
+                    self.ignore_patterns.append(pattern)
+                    
+                    # Plain directory names like "build/" match any
+                    # path segment, which a set lookup can answer
+                    name = line[:-1]
+                    if (is_dir_only and not is_anchored and name
+                            and not any(c in name for c in '*?[/')):
+                        self._literal_dirs.add(name)
+                    else:
+                        regex_patterns.append(pattern)
+                except Exception as e:
+                    print(f"Error processing line {line_num}: {line} - {str(e)}")
+        
+        self._combined_pattern = self._combine_patterns(regex_patterns)
+        self._pattern_set = self._build_pattern_set(regex_patterns)
+        self._loaded = True
+    
+    def _combine_patterns(self, patterns):
+        """
+        Merge compiled ignore patterns into a single alternation.
+        
+        Args:
+            patterns: The compiled patterns to merge
+            
+        Returns:
+            A compiled regex matching any of the patterns, or None if there are none
+        """
+        if not patterns:
+            return None
+        return re.compile('|'.join(f'(?:{p.pattern})' for p in patterns))
+    
+    def _build_pattern_set(self, patterns):
+        """
+        Compile ignore patterns into an RE2 set when google-re2 is installed.
+        
+        An RE2 set matches all patterns in one linear-time scan of the path.
+        
+        Args:
+            patterns: The compiled patterns to add to the set
+            
+        Returns:
+            A compiled re2.Set, or None if re2 is unavailable or rejects a pattern
+        """
+        if re2 is None or not patterns:
+            return None
+        
+        try:
+            pattern_set = re2.Set.SearchSet()
+            for pattern in patterns:
+                pattern_set.Add(pattern.pattern)
+            pattern_set.Compile()
+        except Exception:
+            # Fall back to the combined Python regex
+            return None
+        return pattern_set
     
     def _glob_to_regex(self, pattern):
         """
-        Convert a glob pattern to a regex pattern.
+        Convert a glob pattern to a regex pattern in a single pass.
         
         Args:
             pattern: The glob pattern to convert
             
         Returns:
-            A compiled regex pattern
+            A (compiled regex, is_dir_only, is_anchored) tuple
         """
         # Handle directory-specific patterns (ending with /)
         is_dir_only = pattern.endswith('/')
         if is_dir_only:
             pattern = pattern[:-1]
         
-        # Handle patterns that should match from the root
-        if pattern.startswith('/'):
-            # Remove leading slash for the regex pattern
+        # Patterns with a leading slash only match from the root, the rest
+        # can match after any directory separator
+        is_anchored = pattern.startswith('/')
+        if is_anchored:
             pattern = pattern[1:]
-            # Anchor to the beginning of the string
-            regex_pattern = '^' + re.escape(pattern)
-        else:
-            # Patterns without leading slash can match anywhere in the path
-            # Add optional leading slash and optional path prefix
-            regex_pattern = '(^|/)' + re.escape(pattern)
-        
-        # Replace glob wildcards with regex equivalents
-        # First, temporarily replace escaped asterisks to avoid confusion
-        regex_pattern = regex_pattern.replace(r'\*\*', '__DOUBLE_ASTERISK__')
-        regex_pattern = regex_pattern.replace(r'\*', '__SINGLE_ASTERISK__')
-        regex_pattern = regex_pattern.replace(r'\?', '__QUESTION_MARK__')
-        
-        # Now replace with the actual regex patterns
-        regex_pattern = regex_pattern.replace('__DOUBLE_ASTERISK__', '.*')  # ** matches any number of directories
-        regex_pattern = regex_pattern.replace('__SINGLE_ASTERISK__', '[^/]*')  # * matches any characters except /
-        regex_pattern = regex_pattern.replace('__QUESTION_MARK__', '[^/]')   # ? matches a single character except /
-        
-        # Add directory-only constraint if needed
-        if is_dir_only:
-            regex_pattern += '(/|$)'
-        else:
-            # Match the pattern at the end of the path or followed by /
-            regex_pattern += '(/|$)'
+        parts = ['^' if is_anchored else '(^|/)']
+        
+        # Translate glob wildcards, escaping everything else
+        i = 0
+        while i < len(pattern):
+            char = pattern[i]
+            if pattern.startswith('**', i):
+                parts.append('.*')  # ** matches any number of directories
+                i += 2
+                continue
+            if char == '*':
+                parts.append('[^/]*')  # * matches any characters except /
+            elif char == '?':
+                parts.append('[^/]')  # ? matches a single character except /
+            else:
+                parts.append(re.escape(char))
+            i += 1
+        
+        # Match the pattern at the end of the path or followed by /, which
+        # also covers every path below a matching directory
+        parts.append('(/|$)')
         
-        return re.compile(regex_pattern)
+        return re.compile(''.join(parts)), is_dir_only, is_anchored
     
     def is_ignored(self, path):
         """
         Check if a path should be ignored based on the ignore patterns.
+        Results are cached per path until the patterns are reloaded.
+        
+        Args:
+            path: The path to check (relative to repository root)
+            
+        Returns:
+            True if the path should be ignored, False otherwise
+        """
+        if not self._loaded:
+            self._load_ignore_patterns()
+        return self._is_ignored_cached(path)
+    
+    def _is_ignored(self, path):
+        """
+        Uncached implementation of is_ignored.
         
         Args:
             path: The path to check (relative to repository root)
@@ -104,27 +192,26 @@ class PyGitIgnore:
             return True
         
         # Normalize path to use forward slashes
-        path = path.replace('\\', '/')
-        
-        # Check if path matches any ignore pattern
-        for pattern in self.ignore_patterns:
-            if pattern.search(path):
-                return True
-        
-        # Check if any parent directory is ignored
-        path_parts = path.split('/')
-        for i in range(1, len(path_parts)):
-            parent_path = '/'.join(path_parts[:i])
-            for pattern in self.ignore_patterns:
-                if pattern.search(parent_path + '/'):
-                    return True
-        
-        return False
+        path = norm_path(path)
+        
+        if self._literal_dirs and not self._literal_dirs.isdisjoint(path.split('/')):
+            return True
+        
+        # Every pattern ends in (/|$), so a match on any parent directory
+        # is also found by searching the full path
+        if self._pattern_set is not None:
+            return self._pattern_set.Match(path) is not None
+        if self._combined_pattern is None:
+            return False
+        return self._combined_pattern.search(path) is not None
     
     def debug_patterns(self):
         """
         Print all loaded ignore patterns for debugging purposes.
         """
+        if not self._loaded:
+            self._load_ignore_patterns()
+        
         print("Loaded .pygitignore patterns:")
         for i, pattern in enumerate(self.ignore_patterns):
             print(f"{i+1}. {pattern.pattern}")
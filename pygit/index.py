@@ -1,11 +1,41 @@
+import difflib
+import io
 import os
 import json
-import hashlib
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from .objects import FileChangedError
+from .utils import StatCache, norm_path, stat_key
+
+# Binary index layout: header (magic, version, entry count), then per entry
+# the raw SHA-1, mtime, size, mode and stat identity (ctime_ns, mtime_ns,
+# inode, device) followed by the NUL-terminated path. Version 1 entries
+# had no stat identity.
+INDEX_MAGIC = b'PGIX'
+INDEX_VERSION = 2
+INDEX_HEADER = struct.Struct('>4sBI')
+INDEX_ENTRY_V1 = struct.Struct('>20sdQI')
+INDEX_ENTRY = struct.Struct('>20sdQIqqQQ')
+
+# Entry fields that identify an unchanged file without hashing it
+STAT_FIELDS = ('size', 'ctime_ns', 'mtime_ns', 'ino', 'dev')
+
+# The tracking file uses the same layout, with the raw SHA-1 and commit
+# followed by the STAT_FIELDS of each committed file
+TRACKING_MAGIC = b'PGTR'
+TRACKING_VERSION = 1
+TRACKING_ENTRY = struct.Struct('>20s20sqqqQQ')
 
 class PyGitIndex:
     def __init__(self, pygit_instance):
         """Initialize index management"""
         self.pygit = pygit_instance
+        # Parsed index and tracking files
+        self._index_cache = StatCache(pygit_instance.index_file, self._parse_index)
+        self._tracking_cache = StatCache(os.path.join(pygit_instance.pygit_dir, 'tracking'),
+                                         self._parse_tracking)
+        # Blob SHA-1s computed while comparing files: path -> (stat identity, sha1)
+        self._content_hashes = {}
 
     def commit(self, message):
         """
@@ -29,10 +59,11 @@ class PyGitIndex:
         tree_sha = self.pygit.objects.hash_object(tree_content, 'tree')
         
         # Get parent commit if it exists
-        parent_commit = None
-        if os.path.exists(self.pygit.head_file):
+        try:
             with open(self.pygit.head_file, 'r') as f:
                 parent_commit = f.read().strip()
+        except FileNotFoundError:
+            parent_commit = None
         
         # Create a new commit object with parent reference if available
         commit_content = f"tree {tree_sha}\n"
@@ -45,12 +76,7 @@ class PyGitIndex:
         # Update the HEAD to point to the new commit
         with open(self.pygit.head_file, 'w') as f:
             f.write(commit_sha + "\n")
-        
-        # Save the commit object
-        commit_path = os.path.join(self.pygit.pygit_dir, 'objects', commit_sha[:2], commit_sha[2:])
-        os.makedirs(os.path.dirname(commit_path), exist_ok=True)
-        with open(commit_path, 'wb') as f:
-            f.write(self.pygit.objects.encode_object(commit_content.encode(), 'commit'))
+        self.pygit._head_cache = None
         
         # Instead of clearing the index, we need to update a tracking file
         # that records which files are committed
@@ -72,24 +98,26 @@ class PyGitIndex:
         Returns:
             bytes: The tree content in Git's binary format
         """
-        # Tree objects in Git have a specific binary format
-        tree_content = b''
+        # Tree objects in Git have a specific binary format; entries are
+        # collected and joined once rather than concatenated one by one
+        parts = []
         
-        # Sort entries to ensure consistent tree hashes
-        for path, info in sorted(index.items()):
+        # Encode each path once and sort the entries by those bytes to
+        # ensure consistent tree hashes (UTF-8 preserves code point order)
+        entries = [(path.encode(), info) for path, info in index.items()]
+        entries.sort(key=lambda entry: entry[0])
+        
+        for path, info in entries:
             # Convert mode to octal string and then to bytes
             mode_str = f"{info['mode']:o}".encode()  # Convert mode to octal representation
             
             # Format: [mode] [space] [filename] [null byte] [SHA-1 binary]
-            entry = mode_str + b' ' + path.encode() + b'\0'
+            parts.append(mode_str + b' ' + path + b'\0')
             
             # Convert SHA-1 from hex to binary
-            sha1_binary = bytes.fromhex(info['sha1'])
-            
-            # Append to tree content
-            tree_content += entry + sha1_binary
+            parts.append(bytes.fromhex(info['sha1']))
         
-        return tree_content
+        return b''.join(parts)
     
     
     def add(self, paths):
@@ -102,9 +130,14 @@ class PyGitIndex:
         if isinstance(paths, str):
             paths = [paths]
             
-        # Load current index
+        # Load current index and tracking info once for all paths
         index = self._load_index()
+        tracking = self._load_tracking()
         
+        # Collect every file to consider first, so they can all be hashed
+        # in one parallel pass; items are (rel_path, dir_entry, from_dir)
+        candidates = []
+        seen = set()
         for path in paths:
             abs_path = os.path.join(self.pygit.root_path, path)
             
@@ -113,133 +146,239 @@ class PyGitIndex:
                 continue
                 
             if os.path.isdir(abs_path):
-                # Recursively add all files in directory
-                for root, _, files in os.walk(abs_path):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        rel_path = os.path.relpath(file_path, self.pygit.root_path)
-                        rel_path = rel_path.replace('\\', '/')  # Normalize path
-                        
-                        # Check if file should be ignored
-                        if not self.pygit.ignore.is_ignored(rel_path):
-                            # Only add if file is new or modified
-                            if self._should_add_file(rel_path, index):
-                                print(f"Added: {rel_path}")
-                                self._add_file(rel_path, index)
+                # Recursively collect all files in directory that aren't ignored
+                found = self._walk_files(abs_path)
+                from_dir = True
             else:
                 # Add single file if not ignored
-                rel_path = os.path.relpath(abs_path, self.pygit.root_path)
-                rel_path = rel_path.replace('\\', '/')  # Normalize path
-                
-                if not self.pygit.ignore.is_ignored(rel_path):
-                    # Only add if file is new or modified
-                    if self._should_add_file(rel_path, index):
-                        self._add_file(rel_path, index)
+                rel_path = norm_path(os.path.relpath(abs_path, self.pygit.root_path))
+                if self.pygit.ignore.is_ignored(rel_path):
+                    continue
+                found = [(rel_path, None)]
+                from_dir = False
+            
+            for rel_path, dir_entry in found:
+                if rel_path not in seen:
+                    seen.add(rel_path)
+                    candidates.append((rel_path, dir_entry, from_dir))
+        
+        # Hash the files in parallel, comparing each against its staged
+        # or committed entry so only new or modified files are stored
+        results = self._map_files(
+            lambda item: self._stat_and_hash(
+                item[0], index.get(item[0], tracking.get(item[0])), item[1]
+            ),
+            candidates
+        )
+        
+        # Merge into the index on this thread
+        for (_, _, from_dir), (rel_path, stat, sha1) in zip(candidates, results):
+            if sha1 is None:
+                continue
+            if from_dir:
+                print(f"Added: {rel_path}")
+            index[rel_path] = self._make_entry(sha1, stat)
+            print(f"Added {rel_path}")
         
         # Save updated index
         self._save_index(index)
-
-    def _should_add_file(self, path, index):
+    
+    def _walk_files(self, top):
         """
-        Check if a file should be added to the index.
+        Walk the files below a directory, skipping ignored paths.
+        
+        Uses os.scandir, whose entries already know their file type and
+        cache their stat result, and never descends into an ignored
+        directory, since everything below it is ignored as well. Files
+        are visited in the same order as os.walk.
         
         Args:
-            path: Relative path to the file
-            index: Current index dictionary
+            top: Absolute path of the directory to walk
             
-        Returns:
-            bool: True if file should be added, False otherwise
+        Yields:
+            tuple: (rel_path, dir_entry) for each file that isn't ignored
         """
-        abs_path = os.path.join(self.pygit.root_path, path)
-        tracking = self._load_tracking()
+        rel_top = norm_path(os.path.relpath(top, self.pygit.root_path))
+        stack = [(top, '' if rel_top == '.' else rel_top + '/')]
+        
+        while stack:
+            dir_path, rel_dir = stack.pop()
+            try:
+                scanner = os.scandir(dir_path)
+            except OSError:
+                # Unreadable directories are skipped, as os.walk does
+                continue
+            
+            subdirs = []
+            with scanner:
+                for dir_entry in scanner:
+                    rel_path = rel_dir + dir_entry.name
+                    if self.pygit.ignore.is_ignored(rel_path):
+                        continue
+                    
+                    try:
+                        is_dir = dir_entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    
+                    if not is_dir:
+                        yield rel_path, dir_entry
+                    elif not dir_entry.is_symlink():
+                        subdirs.append((dir_entry.path, rel_path + '/'))
+            
+            # Pushed in reverse so they're popped in directory order
+            stack.extend(reversed(subdirs))
+    
+    def _is_modified(self, abs_path, entry, stat=None):
+        """
+        Check if a file's content differs from an index or tracking entry.
         
-        # Normalize the path for consistency
-        rel_path = path.replace('\\', '/')  # Normalize path
+        The file is only hashed when its stat identity no longer matches
+        the one recorded in the entry.
         
-        # If file is not in tracking (never committed) or not in index (not staged), it should be added
-        if rel_path not in tracking and rel_path not in index:
+        Args:
+            abs_path: Absolute path to the file
+            entry: The index or tracking entry to compare against
+            stat: Optional stat result of the file, fetched if not given
+            
+        Returns:
+            bool: True if the file has been modified
+            
+        Raises:
+            OSError: If the file can't be read
+        """
+        if stat is None:
+            stat = os.stat(abs_path)
+        # An untouched file can't have changed, so skip hashing it
+        if self._stat_matches(entry, stat):
+            return False
+        
+        # A different size means different content
+        if 'size' in entry and stat.st_size != entry['size']:
             return True
         
-        # Check if the file has been modified compared to what's in the index
-        if rel_path in index:
-            try:
-                stat = os.stat(abs_path)
-                # If size or modification time changed, file should be added
-                if stat.st_size != index[rel_path]['size'] or stat.st_mtime > index[rel_path]['mtime']:
-                    return True
-                
-                # Verify content hash
-                with open(abs_path, 'rb') as f:
-                    content = f.read()
-                current_sha1 = hashlib.sha1(f"blob {len(content)}\0".encode() + content).hexdigest()
-                return current_sha1 != index[rel_path]['sha1']
-                
-            except OSError:
-                # File might have been deleted
-                return True
+        # Verify content hash
+        return self._content_sha1(abs_path, stat) != entry['sha1']
+    
+    def _content_sha1(self, abs_path, stat):
+        """
+        Compute a file's blob SHA-1, reusing one computed earlier.
         
-        # Check if the file has been modified compared to what's tracked (committed)
-        elif rel_path in tracking:
-            try:
-                with open(abs_path, 'rb') as f:
-                    content = f.read()
-                current_sha1 = hashlib.sha1(f"blob {len(content)}\0".encode() + content).hexdigest()
-                return current_sha1 != tracking[rel_path]['sha1']
-            except OSError:
-                # File might have been deleted
-                return True
+        Hashes are remembered per path together with the file's stat
+        identity, so a file compared by get_changed_files is not hashed
+        again when add stores it.
         
-        return False
+        Args:
+            abs_path: Absolute path to the file
+            stat: The current stat result of the file
+            
+        Returns:
+            str: The hex SHA-1 of the file as a blob
+        """
+        sha1 = self._cached_sha1(abs_path, stat)
+        if sha1 is None:
+            sha1 = self.pygit.objects._blob_sha1(abs_path)
+            self._content_hashes[abs_path] = (self._stat_identity(stat), sha1)
+        return sha1
     
-    def _add_file(self, path, index):
+    def _cached_sha1(self, abs_path, stat):
+        """Return the remembered blob SHA-1 of a file if its stat identity is unchanged"""
+        cached = self._content_hashes.get(abs_path)
+        if cached is not None and cached[0] == self._stat_identity(stat):
+            return cached[1]
+        return None
+    
+    def _stat_identity(self, stat):
+        """Return the stat fields that change whenever a file is modified"""
+        return stat.st_size, stat.st_mtime_ns, stat.st_ctime_ns, stat.st_ino, stat.st_dev
+    
+    def _stat_and_hash(self, path, entry=None, dir_entry=None):
         """
-        Add a single file to the index.
+        Stat a working tree file and store its content as a blob.
+        
+        Safe to call from worker threads, as it doesn't touch the index.
         
         Args:
             path: The path to the file (relative to repository root)
-            index: The current index dictionary
+            entry: Optional index or tracking entry; the file is only
+                hashed if it has been modified compared to it
+            dir_entry: Optional os.DirEntry of the file, whose cached
+                stat result is used for that comparison
+            
+        Returns:
+            tuple: (path, stat, sha1), where sha1 is None if the file is
+                unchanged, missing or not a regular file
         """
         abs_path = os.path.join(self.pygit.root_path, path)
+        try:
+            # The cached stat of a directory entry rules out most untouched
+            # files without opening them
+            if (entry is not None and dir_entry is not None
+                    and self._stat_matches(entry, dir_entry.stat())):
+                return path, None, None
+            
+            with open(abs_path, 'rb') as f:
+                stat = os.fstat(f.fileno())
+                if entry is not None and not self._is_modified(abs_path, entry, stat):
+                    return path, None, None
+                
+                # A file hashed for the comparison needs no more work if its
+                # object is already stored; otherwise it is hashed again while
+                # being compressed, since the file may have changed within
+                # the same mtime tick and must be stored under its real SHA-1
+                sha1 = self._cached_sha1(abs_path, stat)
+                if sha1 is None or not self.pygit.objects.has_object(sha1):
+                    sha1 = self.pygit.objects.hash_file(f, stat.st_size, 'blob')
+        except FileChangedError as e:
+            # Skip just this file; the rest of the add goes ahead
+            print(f"Warning: Skipping {path}: {e}")
+            return path, None, None
+        except OSError:
+            # File might have been deleted or be a directory
+            return path, None, None
+        
+        return path, stat, sha1
+    
+    def _map_files(self, func, items):
+        """
+        Apply func to each item on a thread pool, preserving order.
         
-        # Skip .pygit directory and non-files
-        if not os.path.isfile(abs_path):
-            return
-        
-        # Read file content
-        with open(abs_path, 'rb') as f:
-            content = f.read()
-        
-        # Hash and store the file content
-        sha1 = self.pygit.objects.hash_object(content, 'blob')
+        Hashing and zlib release the GIL, so per-file work scales with
+        the number of cores.
         
-        # Update the index
-        stat = os.stat(abs_path)
-        index[path] = {
-            'sha1': sha1,
-            'mtime': stat.st_mtime,
-            'size': stat.st_size,
-            'mode': stat.st_mode
-        }
+        Args:
+            func: Function to apply to each item
+            items: List of items
+            
+        Returns:
+            list: The results, in the same order as items
+        """
+        if len(items) < 2:
+            return [func(item) for item in items]
         
-        # Print confirmation
-        print(f"Added {path}")
+        workers = min(32, os.cpu_count() or 1, len(items))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(func, items))
     
     def _load_index(self):
         """
         Load the index file.
         
+        The parsed index is cached and reused for as long as the index
+        file's mtime and size are unchanged.
+        
         Returns:
             A dictionary containing the index data
         """
-        if not os.path.exists(self.pygit.index_file):
+        index = self._index_cache.load()
+        return {} if index is None else self._copy_index(index)
+    
+    def _parse_index(self, data):
+        """Decode the index file, treating an empty or invalid file as an empty index"""
+        try:
+            return self._decode_index(data)
+        except (ValueError, IndexError, struct.error):
             return {}
-            
-        with open(self.pygit.index_file, 'r') as f:
-            try:
-                return json.load(f)
-            except json.JSONDecodeError:
-                # Return empty dict if file is empty or invalid
-                return {}
     
     def _save_index(self, index):
         """
@@ -248,8 +387,272 @@ class PyGitIndex:
         Args:
             index: The index dictionary to save
         """
-        with open(self.pygit.index_file, 'w') as f:
-            json.dump(index, f, indent=2)
+        index = self._smudge_racy_entries(index)
+        with open(self.pygit.index_file, 'wb') as f:
+            f.write(self._encode_index(index))
+            if self.pygit.durable:
+                f.flush()
+                os.fsync(f.fileno())
+        self._index_cache.store(self._copy_index(index))
+    
+    def _smudge_racy_entries(self, index):
+        """
+        Re-check entries that are racy against the index being replaced.
+        
+        An entry carried over from the current index file whose mtime is
+        not older than that file may have been edited again within the
+        same timestamp tick. Once the index is rewritten with a later
+        mtime, _stat_matches would trust such an entry, so as in Git its
+        file is hashed now. If the content no longer matches, the entry's
+        mtime is cleared so its stat never matches and the change shows up.
+        
+        Args:
+            index: The index dictionary about to be saved
+            
+        Returns:
+            dict: The index to save, with smudged entries copied
+        """
+        # Only entries known to come from the file being replaced can be racy
+        # against it; entries made since were stat'ed after it was written
+        key = stat_key(self.pygit.index_file)
+        if key is None or key != self._index_cache.key:
+            return index
+        cutoff = key[0]
+        old_index = self._index_cache.value
+        
+        smudged = None
+        for path, entry in index.items():
+            if entry.get('mtime_ns', 0) < cutoff or old_index.get(path) != entry:
+                continue
+            try:
+                sha1 = self.pygit.objects._blob_sha1(os.path.join(self.pygit.root_path, path))
+            except OSError:
+                # Missing files already fail the stat comparison
+                continue
+            if sha1 != entry['sha1']:
+                if smudged is None:
+                    smudged = dict(index)
+                smudged[path] = dict(entry, mtime_ns=0)
+        
+        return index if smudged is None else smudged
+    
+    def _encode_index(self, index):
+        """
+        Pack an index dictionary into the binary index format.
+        
+        Args:
+            index: The index dictionary to pack
+            
+        Returns:
+            bytes: The packed index
+        """
+        records = []
+        for path, info in index.items():
+            records.append((path, (bytes.fromhex(info['sha1']), info['mtime'], info['size'],
+                                   info['mode'], info.get('ctime_ns', 0), info.get('mtime_ns', 0),
+                                   info.get('ino', 0), info.get('dev', 0))))
+        return self._pack_records(INDEX_MAGIC, INDEX_VERSION, INDEX_ENTRY, records)
+    
+    def _decode_index(self, data):
+        """
+        Unpack the contents of an index file.
+        
+        Indices written before the binary format existed are stored as JSON;
+        those are still read and get rewritten in binary on the next save.
+        
+        Args:
+            data: The raw bytes of the index file
+            
+        Returns:
+            dict: The index dictionary
+        """
+        if not data.startswith(INDEX_MAGIC):
+            return json.loads(data)
+        
+        version = data[len(INDEX_MAGIC)]
+        if version == INDEX_VERSION:
+            entry_struct = INDEX_ENTRY
+        elif version == 1:
+            entry_struct = INDEX_ENTRY_V1
+        else:
+            raise ValueError(f"Unsupported index version {version}")
+        
+        index = {}
+        for path, fields in self._unpack_records(data, entry_struct):
+            info = {
+                'sha1': fields[0].hex(),
+                'mtime': fields[1],
+                'size': fields[2],
+                'mode': fields[3]
+            }
+            if version == INDEX_VERSION:
+                info.update(ctime_ns=fields[4], mtime_ns=fields[5], ino=fields[6], dev=fields[7])
+            index[path] = info
+        
+        return index
+    
+    def _encode_tracking(self, tracking):
+        """
+        Pack tracking data into the binary tracking format.
+        
+        Args:
+            tracking: The tracking dictionary to pack
+            
+        Returns:
+            bytes: The packed tracking data
+        """
+        records = []
+        for path, info in tracking.items():
+            # A size of -1 marks entries recorded without a stat identity
+            records.append((path, (bytes.fromhex(info['sha1']), bytes.fromhex(info['commit']),
+                                   info.get('size', -1), info.get('ctime_ns', 0),
+                                   info.get('mtime_ns', 0), info.get('ino', 0),
+                                   info.get('dev', 0))))
+        return self._pack_records(TRACKING_MAGIC, TRACKING_VERSION, TRACKING_ENTRY, records)
+    
+    def _decode_tracking(self, data):
+        """
+        Unpack the contents of a tracking file, falling back to the old JSON format.
+        
+        Args:
+            data: The raw bytes of the tracking file
+            
+        Returns:
+            dict: The tracking dictionary
+        """
+        if not data.startswith(TRACKING_MAGIC):
+            return json.loads(data)
+        
+        version = data[len(TRACKING_MAGIC)]
+        if version != TRACKING_VERSION:
+            raise ValueError(f"Unsupported tracking version {version}")
+        
+        tracking = {}
+        for path, fields in self._unpack_records(data, TRACKING_ENTRY):
+            info = {'sha1': fields[0].hex(), 'commit': fields[1].hex()}
+            if fields[2] >= 0:
+                info.update(zip(STAT_FIELDS, fields[2:]))
+            tracking[path] = info
+        
+        return tracking
+    
+    def _pack_records(self, magic, version, entry_struct, records):
+        """
+        Pack path-keyed records behind a (magic, version, count) header.
+        
+        Each record is written as its fixed-size fields followed by the
+        NUL-terminated UTF-8 path, into one preallocated buffer.
+        
+        Args:
+            magic: The 4-byte file magic
+            version: The format version
+            entry_struct: The struct.Struct for the fixed-size fields
+            records: A list of (path, fields) tuples
+            
+        Returns:
+            bytes: The packed records
+        """
+        encoded = [(path.encode(), fields) for path, fields in records]
+        size = INDEX_HEADER.size + sum(entry_struct.size + len(raw) + 1 for raw, _ in encoded)
+        buf = bytearray(size)
+        
+        INDEX_HEADER.pack_into(buf, 0, magic, version, len(encoded))
+        offset = INDEX_HEADER.size
+        for raw, fields in encoded:
+            entry_struct.pack_into(buf, offset, *fields)
+            offset += entry_struct.size
+            # The buffer is zero-filled, so the NUL terminator is already there
+            buf[offset:offset + len(raw)] = raw
+            offset += len(raw) + 1
+        
+        return bytes(buf)
+    
+    def _unpack_records(self, data, entry_struct):
+        """
+        Iterate over the records packed by _pack_records.
+        
+        Args:
+            data: The packed bytes, including the header
+            entry_struct: The struct.Struct for the fixed-size fields
+            
+        Yields:
+            tuple: (path, fields) for each record
+        """
+        _, _, count = INDEX_HEADER.unpack_from(data, 0)
+        view = memoryview(data)
+        offset = INDEX_HEADER.size
+        for _ in range(count):
+            fields = entry_struct.unpack_from(view, offset)
+            offset += entry_struct.size
+            end = data.index(b'\0', offset)
+            yield data[offset:end].decode(), fields
+            offset = end + 1
+    
+    def _make_entry(self, sha1, stat):
+        """
+        Build an index entry for a file.
+        
+        Args:
+            sha1: The SHA-1 of the file's blob
+            stat: The os.stat_result of the file
+            
+        Returns:
+            dict: The index entry
+        """
+        return {
+            'sha1': sha1,
+            'mtime': stat.st_mtime,
+            'size': stat.st_size,
+            'mode': stat.st_mode,
+            'ctime_ns': stat.st_ctime_ns,
+            'mtime_ns': stat.st_mtime_ns,
+            'ino': stat.st_ino,
+            'dev': stat.st_dev
+        }
+    
+    def _stat_matches(self, entry, stat):
+        """
+        Check whether a file is unchanged since an entry was recorded.
+        
+        Matching ctime, mtime, size, inode and device mean the file has not
+        been touched, so its content doesn't need to be hashed again.
+        
+        As in Git, an entry is racy if the file's mtime is not older than
+        the index or tracking file it was read from: the file may have been
+        changed again within the same timestamp tick, without its stat
+        showing it. Racy entries never match, so their content is hashed.
+        
+        Args:
+            entry: An index or tracking entry
+            stat: The current os.stat_result of the file
+            
+        Returns:
+            bool: True if the recorded stat identity matches
+        """
+        if not (entry.get('size') == stat.st_size
+                and entry.get('ctime_ns') == stat.st_ctime_ns
+                and entry.get('mtime_ns') == stat.st_mtime_ns
+                and entry.get('ino') == stat.st_ino
+                and entry.get('dev') == stat.st_dev):
+            return False
+        
+        # The later of the two files' mtimes is used, since the entry may
+        # have come from either; that only ever makes more entries racy
+        written = max((key[0] for key in (self._index_cache.key, self._tracking_cache.key) if key),
+                      default=None)
+        return written is None or stat.st_mtime_ns < written
+    
+    def _copy_index(self, index):
+        """
+        Copy an index dictionary so callers can't mutate the cached one.
+        
+        Args:
+            index: The index dictionary to copy
+            
+        Returns:
+            dict: A copy of the index with each entry copied as well
+        """
+        return {path: dict(info) for path, info in index.items()}
     
     def status(self):
         """Show the working tree status"""
@@ -261,45 +664,43 @@ class PyGitIndex:
         modified_not_staged = []
         untracked_files = []
         
-        # First, check all files in the working directory
-        for root, dirs, files in os.walk(self.pygit.root_path):
-            # Skip .pygit directory
-            if '.pygit' in dirs:
-                dirs.remove('.pygit')
-                
-            for file in files:
-                abs_path = os.path.join(root, file)
-                rel_path = os.path.relpath(abs_path, self.pygit.root_path)
-                rel_path = rel_path.replace('\\', '/')  # Normalize path
+        # Tracked files still to be compared against their committed version
+        to_check = []
+        
+        # Files seen in the working directory
+        present = set()
+        
+        # First, check all files in the working directory, skipping ignored ones
+        for rel_path, dir_entry in self._walk_files(self.pygit.root_path):
+            present.add(rel_path)
+            
+            # Check if file is in index (staged)
+            if rel_path in index:
+                staged_changes.append(f"modified: {rel_path}")
+                continue
                 
-                # Skip ignored files
-                if self.pygit.ignore.is_ignored(rel_path):
-                    continue
-                    
-                # Check if file is in index (staged)
-                if rel_path in index:
-                    staged_changes.append(f"modified: {rel_path}")
-                    continue
-                    
-                # Check if file is tracked (committed)
-                if rel_path in tracking:
-                    # File is tracked, check if modified
-                    with open(abs_path, 'rb') as f:
-                        content = f.read()
-                    
-                    # Verify content hash
-                    current_sha1 = hashlib.sha1(f"blob {len(content)}\0".encode() + content).hexdigest()
-                    if current_sha1 != tracking[rel_path]['sha1']:
-                        # File is modified but not staged
-                        modified_not_staged.append(f"modified: {rel_path}")
-                else:
-                    # File is untracked
-                    untracked_files.append(rel_path)
+            # Check if file is tracked (committed)
+            if rel_path in tracking:
+                # File is tracked, check if modified below
+                to_check.append((rel_path, dir_entry))
+            else:
+                # File is untracked
+                untracked_files.append(rel_path)
+        
+        # Hash the tracked files in parallel
+        modified = self._map_files(
+            lambda item: self._is_modified(item[1].path, tracking[item[0]], item[1].stat()),
+            to_check
+        )
+        for (rel_path, _), is_modified in zip(to_check, modified):
+            if is_modified:
+                # File is modified but not staged
+                modified_not_staged.append(f"modified: {rel_path}")
         
         # Check for deleted files (in tracking but not in working directory)
         for path in tracking:
             abs_path = os.path.join(self.pygit.root_path, path)
-            if not os.path.exists(abs_path) and path not in index:
+            if path not in present and path not in index and not os.path.exists(abs_path):
                 modified_not_staged.append(f"deleted: {path}")
         
         # Print status report
@@ -335,35 +736,25 @@ class PyGitIndex:
                 print(f"File deleted: {path}")
                 continue
                 
-            with open(abs_path, 'rb') as f:
-                content = f.read()
-                
             # Hash the current content
-            current_sha = hashlib.sha1(f"blob {len(content)}\0".encode() + content).hexdigest()
+            current_sha = self.pygit.objects._blob_sha1(abs_path)
             
             # Compare with staged version
             if current_sha != info['sha1']:
                 print(f"File modified: {path}")
                 
-                # Get the staged content
-                _, staged_content = self.pygit.objects.get_object(info['sha1'], 'blob')
+                # Decode the staged and current content as text
+                staged = self.pygit.objects.open_object(info['sha1'], 'blob')
+                with io.TextIOWrapper(io.BufferedReader(staged), encoding='utf-8', errors='replace') as f:
+                    staged_lines = f.read().splitlines()
+                with open(abs_path, 'r', encoding='utf-8', errors='replace') as f:
+                    current_lines = f.read().splitlines()
                 
-                # Simple diff output
-                staged_lines = staged_content.decode(errors='replace').splitlines()
-                current_lines = content.decode(errors='replace').splitlines()
-                
-                for i, (old, new) in enumerate(zip(staged_lines, current_lines)):
-                    if old != new:
-                        print(f"  Line {i+1}: - {old}")
-                        print(f"  Line {i+1}: + {new}")
-                
-                # Show added/removed lines at the end
-                if len(staged_lines) > len(current_lines):
-                    for i in range(len(current_lines), len(staged_lines)):
-                        print(f"  Line {i+1}: - {staged_lines[i]}")
-                elif len(current_lines) > len(staged_lines):
-                    for i in range(len(staged_lines), len(current_lines)):
-                        print(f"  Line {i+1}: + {current_lines[i]}")
+                # Unified diff, which aligns insertions and deletions
+                for line in difflib.unified_diff(staged_lines, current_lines,
+                                                 fromfile=f"{path} (staged)", tofile=path,
+                                                 lineterm=''):
+                    print(f"  {line}")
 
     def add_all(self):
         """
@@ -391,37 +782,26 @@ class PyGitIndex:
         index = self._load_index()
         changed_files = []
         
-        # Check for modified and deleted files
-        for path, info in index.items():
+        def is_changed(item):
+            path, info = item
             abs_path = os.path.join(self.pygit.root_path, path)
-            
-            if not os.path.exists(abs_path):
+            try:
+                # Check if file was modified compared to the staged version
+                return self._is_modified(abs_path, info)
+            except FileNotFoundError:
                 # File was deleted
+                return True
+        
+        # Check for modified and deleted files, hashing in parallel
+        items = list(index.items())
+        for (path, _), changed in zip(items, self._map_files(is_changed, items)):
+            if changed:
                 changed_files.append(path)
-            else:
-                # Check if file was modified
-                with open(abs_path, 'rb') as f:
-                    content = f.read()
-                
-                # Hash the current content
-                current_sha = hashlib.sha1(f"blob {len(content)}\0".encode() + content).hexdigest()
-                
-                # Compare with staged version
-                if current_sha != info['sha1']:
-                    changed_files.append(path)
-        
-        # Check for untracked files
-        for root, dirs, files in os.walk(self.pygit.root_path):
-            # Skip .pygit directory
-            if '.pygit' in dirs:
-                dirs.remove('.pygit')
-                
-            for file in files:
-                abs_path = os.path.join(root, file)
-                rel_path = os.path.relpath(abs_path, self.pygit.root_path)
-                
-                if rel_path not in index:
-                    changed_files.append(rel_path)
+        
+        # Check for untracked files, skipping ignored ones
+        for rel_path, _ in self._walk_files(self.pygit.root_path):
+            if rel_path not in index:
+                changed_files.append(rel_path)
         
         return changed_files  
 
@@ -433,16 +813,9 @@ class PyGitIndex:
             index: The index dictionary that was committed
             commit_sha: The SHA-1 hash of the commit
         """
-        tracking_file = os.path.join(self.pygit.pygit_dir, 'tracking')
-        tracking = {}
-        
-        # Load existing tracking info if it exists
-        if os.path.exists(tracking_file):
-            with open(tracking_file, 'r') as f:
-                try:
-                    tracking = json.load(f)
-                except json.JSONDecodeError:
-                    tracking = {}
+        # Load existing tracking info if it exists, copying it so the
+        # cached dictionary isn't modified
+        tracking = self._copy_index(self._load_tracking())
         
         # Update tracking with the newly committed files
         for path, info in index.items():
@@ -450,25 +823,33 @@ class PyGitIndex:
                 'sha1': info['sha1'],
                 'commit': commit_sha
             }
+            # Keep the stat identity so status can skip hashing untouched files
+            for field in STAT_FIELDS:
+                if field in info:
+                    tracking[path][field] = info[field]
         
         # Save updated tracking info
-        with open(tracking_file, 'w') as f:
-            json.dump(tracking, f, indent=2)
+        with open(self._tracking_cache.path, 'wb') as f:
+            f.write(self._encode_tracking(tracking))
+        self._tracking_cache.store(tracking)
 
     def _load_tracking(self):
         """
         Load the tracking file that records which files are committed.
         
+        The parsed tracking data is cached and reused for as long as the
+        tracking file's mtime and size are unchanged. The returned
+        dictionary is shared and must not be modified.
+        
         Returns:
             dict: A dictionary containing the tracking data
         """
-        tracking_file = os.path.join(self.pygit.pygit_dir, 'tracking')
-        if not os.path.exists(tracking_file):
-            return {}
-        
-        with open(tracking_file, 'r') as f:
-            try:
-                return json.load(f)
-            except json.JSONDecodeError:
-                # Return empty dict if file is empty or invalid
-                return {}  
+        tracking = self._tracking_cache.load()
+        return {} if tracking is None else tracking
+    
+    def _parse_tracking(self, data):
+        """Decode the tracking file, treating an empty or invalid file as empty"""
+        try:
+            return self._decode_tracking(data)
+        except (ValueError, IndexError, struct.error):
+            return {}  
@@ -1,54 +1,343 @@
+import io
+import mmap
 import os
 import hashlib
+import re
+import struct
+import threading
 import zlib
+from collections import OrderedDict
+from .utils import stat_key
+
+# Bounds for the cache of decoded commit and tree objects
+OBJECT_CACHE_ENTRIES = 512
+OBJECT_CACHE_BYTES = 128 * 1024 * 1024
+CACHED_TYPES = ('commit', 'tree')
+
+# Amount of compressed input read, and decompressed output produced, per step
+STREAM_CHUNK_SIZE = 1 << 20
+
+# Loose objects favour write speed over size, as Git's do
+ZLIB_LEVEL = 1
+
+# Files larger than this are memory-mapped for hashing instead of read
+MMAP_THRESHOLD = 1 << 20
+
+# Permissions of stored object files, before the umask is applied
+OBJECT_FILE_MODE = 0o644
+
+# Flags for creating temporary object files, as tempfile.mkstemp uses
+TEMP_FILE_FLAGS = (os.O_WRONLY | os.O_CREAT | os.O_EXCL
+                   | getattr(os, 'O_NOFOLLOW', 0) | getattr(os, 'O_BINARY', 0))
+
+# Pack file layout: header (magic, version, object count), then each
+# object's zlib stream back to back, byte for byte as it was stored loose.
+# The matching .idx file has the same header followed by the raw SHA-1,
+# offset and length of every object, sorted by SHA-1.
+PACK_MAGIC = b'PGPK'
+PACK_IDX_MAGIC = b'PGPI'
+PACK_VERSION = 1
+PACK_HEADER = struct.Struct('>4sBI')
+PACK_IDX_ENTRY = struct.Struct('>20sQQ')
+
+# Loose objects live in objects/<first two hex digits>/<remaining 38>
+_SHARD_RE = re.compile('[0-9a-f]{2}')
+_LOOSE_NAME_RE = re.compile('[0-9a-f]{38}')
+
+class FileChangedError(OSError):
+    """Raised when a file shrinks while it is being hashed and stored"""
+
+def _make_temp_file(dir_path, prefix):
+    """
+    Create a temporary file that will be moved into the object store.
+    
+    Unlike tempfile.mkstemp, which creates files readable only by their
+    owner, the file is created with the normal object permissions and
+    the kernel applies the umask, so shared and served repositories can
+    still read it once it is renamed into place.
+    
+    Args:
+        dir_path: Directory to create the file in
+        prefix: Prefix of the file name
+        
+    Returns:
+        tuple: (file descriptor, path) of the temporary file
+    """
+    while True:
+        path = os.path.join(dir_path, prefix + os.urandom(8).hex())
+        try:
+            return os.open(path, TEMP_FILE_FLAGS, OBJECT_FILE_MODE), path
+        except FileExistsError:
+            # Name collision with another temporary file, pick another name
+            continue
+
+class ObjectReader(io.RawIOBase):
+    """
+    Readable stream over the decompressed content of a stored object.
+    
+    The object header is parsed when the reader is created and exposed as
+    obj_type and size; reads then return the content without the header.
+    """
+    
+    def __init__(self, f):
+        """
+        Args:
+            f: The object file, opened in binary mode; closed with the reader
+        """
+        self._file = f
+        self._decompressor = zlib.decompressobj()
+        self._buffer = b''
+        self._pos = 0
+        
+        # Decompress until the whole "<type> <size>\0" header is buffered
+        while b'\0' not in self._buffer:
+            if not self._fill():
+                raise Exception("Invalid object: missing header")
+        null_index = self._buffer.index(b'\0')
+        obj_type, size = self._buffer[:null_index].decode().split()
+        self.obj_type = obj_type
+        self.size = int(size)
+        self._pos = null_index + 1
+    
+    def _fill(self):
+        """Decompress the next chunk into the buffer; return False at the end"""
+        # Packed objects are followed by other objects' data
+        if self._decompressor.eof:
+            return False
+        data = self._decompressor.unconsumed_tail
+        if not data:
+            data = self._file.read(STREAM_CHUNK_SIZE)
+        if data:
+            chunk = self._decompressor.decompress(data, STREAM_CHUNK_SIZE)
+        else:
+            chunk = self._decompressor.flush()
+        if not chunk and not data:
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+    
+    def readable(self):
+        return True
+    
+    def readinto(self, b):
+        while self._pos >= len(self._buffer):
+            if not self._fill():
+                return 0
+        n = min(len(b), len(self._buffer) - self._pos)
+        b[:n] = self._buffer[self._pos:self._pos + n]
+        self._pos += n
+        return n
+    
+    def close(self):
+        self._file.close()
+        super().close()
 
 class PyGitObjects:
     def __init__(self, pygit_instance):
         """Initialize object storage"""
         self.pygit = pygit_instance
+        
+        # Objects are immutable, so cached entries never need invalidating
+        self._cache = OrderedDict()
+        self._cache_bytes = 0
+        self._cache_lock = threading.Lock()
+        
+        # Two-hex-digit shard directories known to exist
+        self._shard_dirs = set()
+        
+        # Packed object locations and the pack directory stat key they were read at
+        self._packs = (None, {})
     
     def hash_object(self, data, obj_type='blob'):
         """
         Hash an object and store it in the objects database.
         Returns the SHA-1 hash of the object.
         """
-        # Prepare header
-        header = f"{obj_type} {len(data)}\0"
-        store = header.encode() + data if isinstance(data, bytes) else header.encode() + data.encode()
+        if isinstance(data, str):
+            data = data.encode()
+        header = b'%s %d\0' % (obj_type.encode(), len(data))
         
         # Compute SHA-1 hash
-        sha1 = hashlib.sha1(store).hexdigest()
+        h = hashlib.sha1(header)
+        h.update(data)
+        sha1 = h.hexdigest()
+        
+        # Objects are content-addressed, so an existing one needs no rewrite
+        if self.has_object(sha1):
+            return sha1
         
         # Store the object
-        object_path = os.path.join(self.pygit.objects_dir, sha1[:2], sha1[2:])
-        if not os.path.exists(object_path):
-            os.makedirs(os.path.dirname(object_path), exist_ok=True)
-            compressed = zlib.compress(store)
-            with open(object_path, 'wb') as f:
-                f.write(compressed)
+        compressor = zlib.compressobj(ZLIB_LEVEL)
+        stored = compressor.compress(header) + compressor.compress(data) + compressor.flush()
+        fd, tmp_path = self._make_temp_object()
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(stored)
+            self._install_object(tmp_path, sha1)
+        except BaseException:
+            self._discard_temp_object(tmp_path)
+            raise
+        
+        return sha1
+    
+    def hash_file(self, f, size, obj_type='blob'):
+        """
+        Hash the contents of an open file and store it in the objects database.
+        
+        The file is read once in chunks that are fed to both the SHA-1 and
+        a streaming compressor writing to a temporary file, which is then
+        moved into place. The contents are never held in memory whole.
+        
+        Args:
+            f: A file opened in binary mode, positioned at the start
+            size: The number of bytes to read from f
+            obj_type: The object type to store it as
+            
+        Returns:
+            str: The SHA-1 hash of the object
+            
+        Raises:
+            FileChangedError: If f ends before size bytes were read
+        """
+        header = b'%s %d\0' % (obj_type.encode(), size)
+        h = hashlib.sha1(header)
+        compressor = zlib.compressobj(ZLIB_LEVEL)
+        
+        fd, tmp_path = self._make_temp_object()
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                out.write(compressor.compress(header))
+                remaining = size
+                while remaining:
+                    chunk = f.read(min(STREAM_CHUNK_SIZE, remaining))
+                    if not chunk:
+                        raise FileChangedError("File changed while it was being read")
+                    h.update(chunk)
+                    out.write(compressor.compress(chunk))
+                    remaining -= len(chunk)
+                out.write(compressor.flush())
+            
+            sha1 = h.hexdigest()
+            if self.has_object(sha1):
+                os.remove(tmp_path)
+            else:
+                self._install_object(tmp_path, sha1)
+        except BaseException:
+            self._discard_temp_object(tmp_path)
+            raise
         
         return sha1
     
+    def _make_temp_object(self):
+        """
+        Create a temporary file in the objects directory to write an object to.
+        
+        Returns:
+            tuple: (file descriptor, path) of the temporary file
+        """
+        return _make_temp_file(self.pygit.objects_dir, 'tmp_obj_')
+    
+    def _object_path(self, sha1):
+        """
+        Build the path of a loose object.
+        
+        Formatted directly rather than through os.path.join, which is
+        measurably slower when called for every object in a push or pull.
+        
+        Args:
+            sha1: The SHA-1 hash of the object
+            
+        Returns:
+            str: The path of the object file
+        """
+        return f"{self.pygit.objects_dir}{os.sep}{sha1[:2]}{os.sep}{sha1[2:]}"
+    
+    def _install_object(self, tmp_path, sha1):
+        """
+        Atomically move a fully written temporary object file into place.
+        
+        Readers never see a partially written object, and if another
+        writer stored the same object first it is simply replaced with
+        identical content.
+        
+        Args:
+            tmp_path: Path of the temporary file holding the compressed object
+            sha1: The SHA-1 hash of the object
+        """
+        shard = sha1[:2]
+        if shard not in self._shard_dirs:
+            os.makedirs(os.path.join(self.pygit.objects_dir, shard), exist_ok=True)
+            self._shard_dirs.add(shard)
+        os.replace(tmp_path, self._object_path(sha1))
+    
+    def _discard_temp_object(self, tmp_path):
+        """
+        Remove a temporary object file after a failed write.
+        
+        Args:
+            tmp_path: Path of the temporary file
+        """
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+    
+    def _blob_sha1(self, path):
+        """
+        Compute the blob SHA-1 of a file without loading it into memory.
+        
+        The header and file contents are fed to the hash incrementally, so
+        no header+content copy is made and hashlib's OpenSSL backend does
+        the streaming. Large files are memory-mapped and hashed straight
+        from the page cache.
+        
+        Args:
+            path: The path of the file to hash
+            
+        Returns:
+            str: The hex SHA-1 the file would have as a blob object
+        """
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            h = hashlib.sha1(b'blob %d\0' % size)
+            if size > MMAP_THRESHOLD:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    h.update(mm)
+                return h.hexdigest()
+            if hasattr(hashlib, 'file_digest'):
+                return hashlib.file_digest(f, lambda: h).hexdigest()
+            while chunk := f.read(STREAM_CHUNK_SIZE):
+                h.update(chunk)
+            return h.hexdigest()
+    
     def encode_object(self, data, obj_type='blob'):
         """
         Encode an object into a string.
         """
-        return f"{obj_type} {len(data)}\0".encode() + data  
+        return b'%s %d\0' % (obj_type.encode(), len(data)) + data  
     
     
     def get_object(self, sha1, expected_type=None):
         """
         Retrieve an object from the objects database by its SHA-1 hash.
         Optionally verify its type.
+        
+        Commit and tree objects are kept in a bounded LRU cache so repeated
+        traversals don't have to read and decompress them again.
         """
-        object_path = os.path.join(self.pygit.objects_dir, sha1[:2], sha1[2:])
-        if not os.path.exists(object_path):
-            raise Exception(f"Object {sha1} not found")
+        with self._cache_lock:
+            cached = self._cache.get(sha1)
+            if cached is not None:
+                self._cache.move_to_end(sha1)
         
-        with open(object_path, 'rb') as f:
-            compressed_data = f.read()
-            
-        data = zlib.decompress(compressed_data)
+        if cached is not None:
+            obj_type, content = cached
+            if expected_type and obj_type != expected_type:
+                raise Exception(f"Expected {expected_type}, got {obj_type}")
+            return obj_type, content
+        
+        data = zlib.decompress(self.read_raw(sha1))
         
         # Parse the header
         null_index = data.find(b'\0')
@@ -60,4 +349,237 @@ class PyGitObjects:
         if expected_type and obj_type != expected_type:
             raise Exception(f"Expected {expected_type}, got {obj_type}")
         
-        return obj_type, content  
+        if obj_type in CACHED_TYPES:
+            self._cache_object(sha1, obj_type, content)
+        
+        return obj_type, content
+    
+    def open_object(self, sha1, expected_type=None):
+        """
+        Open an object for streaming reads instead of loading it whole.
+        Optionally verify its type.
+        
+        Returns:
+            ObjectReader: A stream over the object's content, to be closed
+            by the caller
+        """
+        object_path = self._object_path(sha1)
+        try:
+            f = open(object_path, 'rb')
+        except FileNotFoundError:
+            location = self._load_packs().get(sha1)
+            if location is None:
+                raise Exception(f"Object {sha1} not found")
+            pack_path, offset, _ = location
+            f = open(pack_path, 'rb')
+            f.seek(offset)
+        
+        try:
+            reader = ObjectReader(f)
+        except Exception:
+            f.close()
+            raise
+        
+        # Verify type if expected
+        if expected_type and reader.obj_type != expected_type:
+            reader.close()
+            raise Exception(f"Expected {expected_type}, got {reader.obj_type}")
+        
+        return reader
+    
+    def has_object(self, sha1):
+        """
+        Check whether an object is stored, either loose or in a pack.
+        
+        Args:
+            sha1: The SHA-1 hash of the object
+            
+        Returns:
+            bool: True if the object exists
+        """
+        object_path = self._object_path(sha1)
+        return os.path.exists(object_path) or sha1 in self._load_packs()
+    
+    def read_raw(self, sha1):
+        """
+        Read an object's compressed data, either loose or from a pack.
+        
+        Args:
+            sha1: The SHA-1 hash of the object
+            
+        Returns:
+            bytes: The zlib-compressed object, header included
+        """
+        object_path = self._object_path(sha1)
+        try:
+            with open(object_path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            pass
+        
+        location = self._load_packs().get(sha1)
+        if location is None:
+            raise Exception(f"Object {sha1} not found")
+        
+        pack_path, offset, length = location
+        with open(pack_path, 'rb') as f:
+            f.seek(offset)
+            return f.read(length)
+    
+    def raw_location(self, sha1):
+        """
+        Find where an object's compressed data is stored on disk.
+        
+        Args:
+            sha1: The SHA-1 hash of the object
+            
+        Returns:
+            tuple: (path, offset, length) of the zlib stream, or None if
+                the object is not stored
+        """
+        object_path = self._object_path(sha1)
+        try:
+            return object_path, 0, os.stat(object_path).st_size
+        except FileNotFoundError:
+            return self._load_packs().get(sha1)
+    
+    def pack_loose(self):
+        """
+        Move all loose objects into a single pack file.
+        
+        Each object's compressed data is copied into the pack unchanged and
+        located through the pack's .idx file, so thousands of small object
+        files become two files. The loose copies are removed afterwards.
+        
+        Returns:
+            str: The SHA-1 of the new pack, or None if there was nothing to pack
+        """
+        objects_dir = self.pygit.objects_dir
+        loose = []
+        shards = []
+        for shard in sorted(os.listdir(objects_dir)):
+            shard_dir = os.path.join(objects_dir, shard)
+            if not _SHARD_RE.fullmatch(shard) or not os.path.isdir(shard_dir):
+                continue
+            shards.append(shard)
+            # Anything that isn't named like an object is left alone
+            for name in os.listdir(shard_dir):
+                if _LOOSE_NAME_RE.fullmatch(name):
+                    loose.append((shard + name, os.path.join(shard_dir, name)))
+        
+        if not loose:
+            print("Nothing to pack")
+            return None
+        
+        pack_dir = os.path.join(objects_dir, 'pack')
+        os.makedirs(pack_dir, exist_ok=True)
+        
+        # The pack is named after the SHA-1 of its contents
+        h = hashlib.sha1()
+        entries = []
+        fd, tmp_pack = _make_temp_file(pack_dir, 'tmp_pack_')
+        tmp_idx = None
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                header = PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, len(loose))
+                out.write(header)
+                h.update(header)
+                offset = len(header)
+                for sha1, path in loose:
+                    with open(path, 'rb') as f:
+                        data = f.read()
+                    out.write(data)
+                    h.update(data)
+                    entries.append((sha1, offset, len(data)))
+                    offset += len(data)
+            
+            entries.sort()
+            fd, tmp_idx = _make_temp_file(pack_dir, 'tmp_idx_')
+            with os.fdopen(fd, 'wb') as out:
+                out.write(PACK_HEADER.pack(PACK_IDX_MAGIC, PACK_VERSION, len(entries)))
+                out.write(b''.join(PACK_IDX_ENTRY.pack(bytes.fromhex(sha1), offset, length)
+                                   for sha1, offset, length in entries))
+            
+            # Move the pack into place before its index, so an index never
+            # refers to a missing pack
+            pack_sha = h.hexdigest()
+            base_path = os.path.join(pack_dir, f"pack-{pack_sha}")
+            os.replace(tmp_pack, base_path + '.pack')
+            os.replace(tmp_idx, base_path + '.idx')
+        except BaseException:
+            self._discard_temp_object(tmp_pack)
+            if tmp_idx is not None:
+                self._discard_temp_object(tmp_idx)
+            raise
+        
+        # The loose copies are now redundant
+        for _, path in loose:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        
+        # Drop the shard directories that are now empty
+        for shard in shards:
+            try:
+                os.rmdir(os.path.join(objects_dir, shard))
+            except OSError:
+                continue
+            self._shard_dirs.discard(shard)
+        
+        print(f"Packed {len(loose)} objects into pack-{pack_sha}.pack")
+        return pack_sha
+    
+    def _load_packs(self):
+        """
+        Load the locations of all packed objects from the pack indexes.
+        
+        The result is cached and reused for as long as the pack directory's
+        mtime and size are unchanged, which they are until a pack is added
+        or removed.
+        
+        Returns:
+            dict: Maps each packed SHA-1 to (pack path, offset, length)
+        """
+        pack_dir = os.path.join(self.pygit.objects_dir, 'pack')
+        key = stat_key(pack_dir)
+        if key is None:
+            return {}
+        
+        cached_key, packs = self._packs
+        if key == cached_key:
+            return packs
+        
+        packs = {}
+        for name in os.listdir(pack_dir):
+            if not name.endswith('.idx'):
+                continue
+            pack_path = os.path.join(pack_dir, name[:-len('.idx')] + '.pack')
+            with open(os.path.join(pack_dir, name), 'rb') as f:
+                data = f.read()
+            try:
+                magic, version, _ = PACK_HEADER.unpack_from(data)
+                if magic != PACK_IDX_MAGIC or version != PACK_VERSION:
+                    continue
+                for raw_sha, offset, length in PACK_IDX_ENTRY.iter_unpack(data[PACK_HEADER.size:]):
+                    packs[raw_sha.hex()] = (pack_path, offset, length)
+            except struct.error:
+                print(f"Skipping invalid pack index: {name}")
+        
+        self._packs = (key, packs)
+        return packs
+    
+    def _cache_object(self, sha1, obj_type, content):
+        """
+        Add a decoded object to the cache, evicting the least recently used
+        entries once the entry or byte budget is exceeded.
+        """
+        with self._cache_lock:
+            if sha1 in self._cache:
+                return
+            self._cache[sha1] = (obj_type, content)
+            self._cache_bytes += len(content)
+            while (len(self._cache) > OBJECT_CACHE_ENTRIES
+                   or self._cache_bytes > OBJECT_CACHE_BYTES):
+                _, (_, evicted) = self._cache.popitem(last=False)
+                self._cache_bytes -= len(evicted)  
@@ -1,48 +1,268 @@
 import os
+import hashlib
 import json
+import logging
 import socket
 import urllib.parse
-import base64
 import time
 import threading
 import urllib.request
 import urllib.error
 import re
+import struct
 import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from .objects import STREAM_CHUNK_SIZE
+from .utils import StatCache
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+logger = logging.getLogger(__name__)
+
+# Hex SHA-1s in raw-format tree objects
+_SHA1_RE = re.compile(b'[0-9a-f]{40}')
+
+# Objects are sent after the JSON header as back-to-back binary frames:
+# raw SHA-1, length of the compressed object, then the compressed object
+OBJECT_FRAME = struct.Struct('>20sI')
+
+# Every JSON message is preceded by its length
+MESSAGE_LENGTH = struct.Struct('>Q')
+
+# Socket buffer sizes, large enough to keep a fast link busy while a
+# whole repository's worth of objects goes one way
+SOCKET_BUFFER_SIZE = 12 * 1024 * 1024
+READ_BUFFER_SIZE = 1 << 20
+
+# Seconds to wait for the remote to answer a have_check before falling
+# back to pushing every object
+NEGOTIATION_TIMEOUT = 10
+
+# Compressed bytes read to check an object's type before reading the rest;
+# enough to cover a dynamic Huffman block header
+TYPE_PEEK_SIZE = 512
+
+def _connect(host, port, timeout=None):
+    """
+    Open a TCP connection to a PyGit server.
+    
+    Large socket buffers are requested before connecting, so they are
+    taken into account for the TCP window, and Nagle's algorithm is
+    disabled since each side sends one complete message at a time.
+    
+    Args:
+        host: The server host name
+        port: The server port
+        timeout: Optional timeout in seconds for connecting and every
+            later socket operation
+        
+    Returns:
+        socket.socket: The connected socket
+    """
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        s.settimeout(timeout)
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
+        s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        s.connect((host, port))
+    except BaseException:
+        s.close()
+        raise
+    return s
+
+def _read_exact(reader, n):
+    """
+    Read exactly n bytes into a preallocated buffer.
+    
+    Args:
+        reader: A binary file object, such as the socket's makefile
+        n: The number of bytes to read
+        
+    Returns:
+        bytearray: The bytes read
+    """
+    buf = bytearray(n)
+    view = memoryview(buf)
+    offset = 0
+    while offset < n:
+        count = reader.readinto(view[offset:])
+        if not count:
+            raise Exception(f"Connection closed after {offset} of {n} bytes")
+        offset += count
+    return buf
+
+def _read_ref(path):
+    """
+    Read a ref file without going through a text-mode file object.
+    
+    Args:
+        path: Path to the ref file
+        
+    Returns:
+        The stripped ref contents, or None if the file does not exist
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        return None
+    try:
+        # Refs hold a single SHA-1 or symbolic ref, well under one read
+        return os.read(fd, 4096).strip().decode('ascii')
+    finally:
+        os.close(fd)
+
+def _is_blob(head):
+    """
+    Check whether the start of a compressed object belongs to a blob.
+    
+    Args:
+        head: The first bytes of the object's zlib stream
+        
+    Returns:
+        True if the object is a blob, False if it isn't or can't be told
+    """
+    try:
+        return zlib.decompressobj().decompress(head, 5) == b'blob '
+    except zlib.error:
+        return False
+
+def _encode_message(obj):
+    """Serialize a JSON message with its length prefix"""
+    payload = _dumps(obj)
+    return MESSAGE_LENGTH.pack(len(payload)) + payload
+
+def _read_message(reader):
+    """Read a length-prefixed JSON message"""
+    length, = MESSAGE_LENGTH.unpack(_read_exact(reader, MESSAGE_LENGTH.size))
+    return _loads(_read_exact(reader, length))
+
+if msgspec is not None:
+    class _PullHeader(msgspec.Struct):
+        """Header of a pull response, decoded without building a dict"""
+        success: bool = False
+        error: Optional[str] = None
+        commit: Optional[str] = None
+        object_count: int = 0
+    
+    _PULL_HEADER_DECODER = msgspec.json.Decoder(_PullHeader)
+
+def _read_pull_header(reader):
+    """
+    Read the length-prefixed JSON header of a pull response.
+    
+    The header is decoded straight into a typed struct when msgspec is
+    installed, and through _loads otherwise.
+    
+    Args:
+        reader: Buffered binary stream over the socket
+        
+    Returns:
+        tuple: (success, error, commit, object_count)
+    """
+    length, = MESSAGE_LENGTH.unpack(_read_exact(reader, MESSAGE_LENGTH.size))
+    data = _read_exact(reader, length)
+    if msgspec is not None:
+        header = _PULL_HEADER_DECODER.decode(data)
+        return header.success, header.error, header.commit, header.object_count
+    
+    header = _loads(data)
+    return (header.get('success', False), header.get('error'),
+            header.get('commit'), header.get('object_count') or 0)
+
+def _parse_tree_shas(content):
+    """
+    Extract the SHA-1s of all entries in a binary tree object.
+    
+    The raw SHA-1s are sliced out of the tree without copying and hex
+    encoded in one call, instead of formatting every byte separately.
+    
+    Args:
+        content: The tree object's content
+        
+    Returns:
+        list: The hex SHA-1 of each entry, in tree order
+    """
+    view = memoryview(content)
+    raw_shas = []
+    i = 0
+    while i < len(content):
+        # Find the null byte that separates filename from SHA
+        null_pos = content.find(b'\0', i)
+        if null_pos == -1 or null_pos + 21 > len(content):
+            break
+        
+        # The SHA is the 20 bytes after the null byte
+        raw_shas.append(view[null_pos + 1:null_pos + 21])
+        
+        # Move to next entry
+        i = null_pos + 21
+    
+    hex_shas = b''.join(raw_shas).hex()
+    return [hex_shas[j:j + 40] for j in range(0, len(hex_shas), 40)]
+
+def _dumps(obj):
+    """Serialize a protocol message to JSON bytes, using orjson when installed"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode()
+
+def _loads(data):
+    """Parse a JSON protocol message from bytes, using orjson when installed"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
 
 class PyGitRemote:
     def __init__(self, pygit_instance):
         """Initialize remote repository management"""
         self.pygit = pygit_instance
+        # Parsed remotes file
+        self._remotes_cache = StatCache(os.path.join(pygit_instance.pygit_dir, 'remotes'), json.loads)
     
     def add(self, name, url):
         """Add a remote repository"""
         # Load the remote config file or create if doesn't exist
-        remote_file = os.path.join(self.pygit.pygit_dir, 'remotes')
-        remotes = {}
-        if os.path.exists(remote_file):
-            with open(remote_file, 'r') as f:
-                remotes = json.load(f)
+        remotes = dict(self._load_remotes())
         
         # Add the new remote
         remotes[name] = url
         
         # Save the remotes file
-        with open(remote_file, 'w') as f:
+        with open(self._remotes_cache.path, 'w') as f:
             json.dump(remotes, f, indent=2)
+        self._remotes_cache.store(remotes)
         
         print(f"Added remote '{name}' with URL: {url}")
     
+    def _load_remotes(self):
+        """
+        Load the remotes file.
+        
+        The parsed remotes are cached and reused for as long as the file's
+        mtime and size are unchanged. The returned dictionary is shared and
+        must not be modified.
+        
+        Returns:
+            dict: Maps remote names to URLs, empty if there are no remotes
+        """
+        remotes = self._remotes_cache.load()
+        return {} if remotes is None else remotes
+    
     def list(self):
         """List remote repositories"""
-        remote_file = os.path.join(self.pygit.pygit_dir, 'remotes')
-        if not os.path.exists(remote_file):
-            print("No remotes configured")
-            return
-            
-        with open(remote_file, 'r') as f:
-            remotes = json.load(f)
-            
+        remotes = self._load_remotes()
         if not remotes:
             print("No remotes configured")
             return
@@ -69,14 +289,7 @@ class PyGitRemote:
             return
             
         # Check if remote exists
-        remote_file = os.path.join(self.pygit.pygit_dir, 'remotes')
-        if not os.path.exists(remote_file):
-            print(f"Remote '{remote_name}' not found")
-            return
-            
-        with open(remote_file, 'r') as f:
-            remotes = json.load(f)
-            
+        remotes = self._load_remotes()
         if remote_name not in remotes:
             print(f"Remote '{remote_name}' not found")
             return
@@ -95,14 +308,11 @@ class PyGitRemote:
         
         # First try to get from branch file
         branch_path = os.path.join(self.pygit.refs_heads_dir, branch)
-        if os.path.exists(branch_path):
-            with open(branch_path, 'r') as f:
-                commit_sha = f.read().strip()
+        commit_sha = _read_ref(branch_path)
         
         # If not found, try to get from HEAD file
-        if not commit_sha and os.path.exists(self.pygit.head_file):
-            with open(self.pygit.head_file, 'r') as f:
-                commit_sha = f.read().strip()
+        if not commit_sha:
+            commit_sha = _read_ref(self.pygit.head_file)
         
         # Verify we have a valid commit SHA
         if not commit_sha:
@@ -111,36 +321,53 @@ class PyGitRemote:
         
         print(f"Pushing commit {commit_sha} to {remote_name}/{branch}")
         
+        # Parse URL parts
+        parsed_url = urllib.parse.urlparse(remote_url)
+        host = parsed_url.hostname
+        port = parsed_url.port or 8471  # Default PyGit port
+        
+        # Ask which commit the remote already has, so only newer objects are sent
+        remote_commit = self._remote_commit(host, port, parsed_url.path.strip('/'), branch)
+        if remote_commit == commit_sha:
+            print("Everything up-to-date")
+            return
+        
         # Prepare payload of objects to send
-        objects_to_send = self._collect_objects_to_push(commit_sha)
+        known = self._known_objects(remote_commit) if remote_commit else None
+        objects_to_send = self._collect_objects_to_push(commit_sha, known)
         
         # Send to remote
         try:
-            # Parse URL parts
-            parsed_url = urllib.parse.urlparse(remote_url)
-            host = parsed_url.hostname
-            port = parsed_url.port or 8471  # Default PyGit port
-            
             # Connect to server
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.connect((host, port))
-                
+            with _connect(host, port) as s, s.makefile('rb', buffering=READ_BUFFER_SIZE) as reader:
                 # Send push request
                 payload = {
                     'command': 'push',
                     'repository': parsed_url.path.strip('/'),
                     'branch': branch,
                     'commit': commit_sha,
-                    'objects': objects_to_send
+                    'object_count': len(objects_to_send)
                 }
                 
-                # Convert to JSON and send
-                json_payload = json.dumps(payload).encode()
-                s.sendall(json_payload)
+                # Send the length-prefixed JSON header followed by the object frames
+                buf = bytearray(_encode_message(payload))
+                for sha_bytes, data in objects_to_send:
+                    if isinstance(data, tuple):
+                        # Splice objects left on disk straight into the socket,
+                        # flushing the frames buffered ahead of them first
+                        path, offset, length = data
+                        buf += OBJECT_FRAME.pack(sha_bytes, length)
+                        s.sendall(buf)
+                        buf.clear()
+                        with open(path, 'rb') as f:
+                            s.sendfile(f, offset, length)
+                    else:
+                        buf += OBJECT_FRAME.pack(sha_bytes, len(data))
+                        buf += data
+                s.sendall(memoryview(buf))
                 
                 # Get response
-                response = s.recv(4096).decode()
-                response_data = json.loads(response)
+                response_data = _read_message(reader)
                 
                 if response_data.get('success'):
                     print(f"Successfully pushed to {remote_name}/{branch}")
@@ -150,29 +377,10 @@ class PyGitRemote:
         except Exception as e:
             print(f"Push failed: {e}")
     
-    def _validate_object_data(self, data):
-        """Validate the received object data"""
-        if not data:
-            return False
-        
-        # Check if data is valid base64
-        try:
-            base64.b64decode(data)
-            return True
-        except:
-            return False
-
     def pull(self, remote_name='origin', branch='master'):
         """Pull changes from a remote repository"""
         # Check if remote exists
-        remote_file = os.path.join(self.pygit.pygit_dir, 'remotes')
-        if not os.path.exists(remote_file):
-            print(f"Remote '{remote_name}' not found")
-            return
-            
-        with open(remote_file, 'r') as f:
-            remotes = json.load(f)
-            
+        remotes = self._load_remotes()
         if remote_name not in remotes:
             print(f"Remote '{remote_name}' not found")
             return
@@ -193,9 +401,7 @@ class PyGitRemote:
             port = parsed_url.port or 8471  # Default PyGit port
             
             # Connect to server
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.connect((host, port))
-                
+            with _connect(host, port) as s, s.makefile('rb', buffering=READ_BUFFER_SIZE) as reader:
                 # Send pull request
                 payload = {
                     'command': 'pull',
@@ -203,98 +409,33 @@ class PyGitRemote:
                     'branch': branch
                 }
                 
-                # Convert to JSON and send
-                json_payload = json.dumps(payload).encode()
-                s.sendall(json_payload)
+                # Send the length-prefixed JSON request
+                s.sendall(_encode_message(payload))
                 
-                # Get response
-                response = b""
-                
-                # First, read the 4-byte length header
-                length_data = b""
-                while len(length_data) < 4:
-                    chunk = s.recv(4 - len(length_data))
-                    if not chunk:
-                        break
-                    length_data += chunk
-                
-                if len(length_data) < 4:
-                    print("Error: Incomplete length header received")
+                # Read the length-prefixed JSON response
+                try:
+                    success, error, remote_commit, object_count = _read_pull_header(reader)
+                except Exception as e:
+                    print(f"Error: Incomplete response received: {e}")
                     return
                 
-                # Convert length to integer
-                json_length = int.from_bytes(length_data, 'big')
-                
-                # Read the JSON data
-                json_data = b""
-                while len(json_data) < json_length:
-                    chunk = s.recv(min(4096, json_length - len(json_data)))
-                    if not chunk:
-                        break
-                    json_data += chunk
-                
-                if len(json_data) < json_length:
-                    print("Error: Incomplete JSON data received")
+                if not success:
+                    print(f"Pull failed: {error or 'Unknown error'}")
                     return
                 
-                # Parse JSON
-                response_data = json.loads(json_data.decode('utf-8'))
-                
-                # Read the binary data
-                binary_data = b""
-                while True:
-                    chunk = s.recv(4096)
-                    if not chunk:
-                        break
-                    binary_data += chunk
-                
-                # If there are objects in the response, process them
-                if 'objects' in response_data and binary_data:
-                    try:
-                        # Decompress the binary data
-                        decoded_objects = zlib.decompress(binary_data)
-                        objects_dict = json.loads(decoded_objects.decode('utf-8'))
-                        response_data['objects'] = objects_dict
-                    except Exception as e:
-                        print(f"Error processing binary objects: {e}")
-                        return
-                
-                if not response_data.get('success'):
-                    print(f"Pull failed: {response_data.get('error', 'Unknown error')}")
+                # Write each object as its frame arrives, so only one object
+                # is held in memory at a time
+                try:
+                    for _ in range(object_count):
+                        sha_bytes, length = OBJECT_FRAME.unpack(_read_exact(reader, OBJECT_FRAME.size))
+                        self._write_pulled_object(sha_bytes.hex(), _read_exact(reader, length))
+                except Exception as e:
+                    print(f"Error processing binary objects: {e}")
                     return
                 
-                # Process objects
-                print(f"Received {len(response_data.get('objects', {}))} objects from remote")
-                for sha, obj_data in response_data.get('objects', {}).items():
-                    print(f"Processing object {sha} ({len(obj_data)} bytes)")
-                    
-                    # Validate object data
-                    if not self._validate_object_data(obj_data):
-                        print(f"Invalid object data for {sha}")
-                        continue
-                        
-                    try:
-                        # Decode base64
-                        decoded_data = base64.b64decode(obj_data)
-                        if not decoded_data:
-                            print(f"Warning: Empty object data for {sha}")
-                            continue
-                            
-                        # Write object to disk
-                        object_path = os.path.join(self.pygit.objects_dir, sha[:2], sha[2:])
-                        os.makedirs(os.path.dirname(object_path), exist_ok=True)
-                        
-                        with open(object_path, 'wb') as f:
-                            f.write(decoded_data)
-                            
-                        print(f"Successfully wrote object {sha}")
-                        
-                    except Exception as e:
-                        print(f"Error processing object {sha}: {str(e)}")
-                        continue
+                print(f"Received {object_count} objects from remote")
                 
                 # Update local branch
-                remote_commit = response_data.get('commit')
                 if remote_commit:
                     # First, check if we have all required objects
                     try:
@@ -323,6 +464,7 @@ class PyGitRemote:
                         branch_path = os.path.join(self.pygit.refs_heads_dir, branch)
                         with open(branch_path, 'w') as f:
                             f.write(remote_commit)
+                        self.pygit._head_cache = None
                             
                         # Update working directory if we're on this branch
                         if self.pygit._get_current_branch() == branch:
@@ -344,15 +486,153 @@ class PyGitRemote:
         except Exception as e:
             print(f"Pull failed: {e}")
     
-    def _collect_objects_to_push(self, commit_sha):
+    def _write_pulled_object(self, sha, data):
+        """
+        Verify an object received from the remote and add it to the object store.
+        
+        The compressed bytes are inflated and hashed before anything is
+        installed, so a corrupt or truncated transfer never lands in the
+        store under a name it doesn't match. The object is written to a
+        temporary file and renamed into place like any other object.
+        
+        Args:
+            sha: The hex SHA-1 of the object
+            data: The compressed object bytes
+            
+        Raises:
+            Exception: If the data doesn't decompress to an object with this SHA-1
+            OSError: If the object can't be written
+        """
+        logger.debug("Processing object %s (%d bytes)", sha, len(data))
+        
+        # Inflate in bounded chunks so a large blob is never fully expanded in memory
+        digest = hashlib.sha1()
+        decompressor = zlib.decompressobj()
+        try:
+            chunk = decompressor.decompress(data, STREAM_CHUNK_SIZE)
+            while chunk:
+                digest.update(chunk)
+                chunk = decompressor.decompress(decompressor.unconsumed_tail, STREAM_CHUNK_SIZE)
+        except zlib.error as e:
+            raise Exception(f"Object {sha} is corrupt: {e}")
+        if not decompressor.eof or digest.hexdigest() != sha:
+            raise Exception(f"Object {sha} does not match its content")
+        
+        objects = self.pygit.objects
+        fd, tmp_path = objects._make_temp_object()
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            objects._install_object(tmp_path, sha)
+        except BaseException:
+            objects._discard_temp_object(tmp_path)
+            raise
+        
+        logger.debug("Successfully wrote object %s", sha)
+    
+    def _remote_commit(self, host, port, repository, branch):
+        """
+        Ask the remote for the commit its branch currently points to.
+        
+        Args:
+            host: The server host name
+            port: The server port
+            repository: The repository path on the server
+            branch: The branch to look up
+            
+        Returns:
+            str: The remote commit SHA-1, or None if the branch doesn't exist
+                there or the server can't answer
+        """
+        payload = {
+            'command': 'have_check',
+            'repository': repository,
+            'branch': branch
+        }
+        
+        try:
+            # Servers that predate negotiation may never answer, so don't
+            # wait on them for long
+            with _connect(host, port, NEGOTIATION_TIMEOUT) as s, s.makefile('rb') as reader:
+                s.sendall(_encode_message(payload))
+                response_data = _read_message(reader)
+            
+            if not response_data.get('success'):
+                return None
+            commit = response_data.get('commit')
+            if commit is not None and not (isinstance(commit, str) and len(commit) == 40):
+                raise ValueError(f"Invalid commit in reply: {commit!r}")
+            return commit
+        except Exception as e:
+            # Servers without negotiation, or with a malformed reply, get a full push
+            logger.debug("have_check failed: %s", e)
+            return None
+    
+    def _known_objects(self, commit_sha):
+        """
+        Find the objects a remote must have if its branch is at commit_sha.
+        
+        Only the commit's own tree is walked, not its history: the walk
+        that collects objects to push stops at the commit, so its
+        ancestors are never reached, and the tree covers every unchanged
+        file and directory. Blobs are never read.
+        
+        Args:
+            commit_sha: SHA-1 hash of the remote's commit
+            
+        Returns:
+            set: SHA-1s of the commit and every object in its tree
+        """
+        known = {commit_sha}
+        
+        # The remote may be on a commit this repository has never seen
+        try:
+            _, commit_data = self.pygit.objects.get_object(commit_sha, 'commit')
+        except Exception:
+            return known
+        
+        pending = []
+        for line in commit_data.decode('utf-8', errors='replace').split('\n'):
+            if line.startswith('tree '):
+                pending.append(line.split(' ', 1)[1].strip())
+                known.add(pending[0])
+                break
+        
+        while pending:
+            try:
+                _, content = self.pygit.objects.get_object(pending.pop(), 'tree')
+            except Exception:
+                continue
+            
+            i = 0
+            while i < len(content):
+                null_pos = content.find(b'\0', i)
+                if null_pos == -1 or null_pos + 21 > len(content):
+                    break
+                
+                entry_sha = content[null_pos + 1:null_pos + 21].hex()
+                if entry_sha not in known:
+                    known.add(entry_sha)
+                    # Directories have mode 40000 and are walked in turn
+                    if content.startswith(b'40', i):
+                        pending.append(entry_sha)
+                
+                i = null_pos + 21
+        
+        return known
+    
+    def _collect_objects_to_push(self, commit_sha, known=None):
         """
         Collect all objects that need to be pushed to the remote
         
         Args:
             commit_sha: SHA-1 hash of the commit to push
+            known: SHA-1s the remote already has, which are neither sent
+                nor followed (optional)
             
         Returns:
-            dict: Dictionary of base64-encoded objects to send
+            list: (raw SHA-1, data) tuples to send, where data is either the
+                compressed object or its (path, offset, length) on disk
         """
         # Ensure .pygit/objects directory exists
         objects_dir = os.path.join(self.pygit.pygit_dir, 'objects')
@@ -362,123 +642,145 @@ class PyGitRemote:
         # Validate commit_sha
         if not commit_sha or len(commit_sha) < 3:
             print(f"Error: Invalid commit SHA: '{commit_sha}'")
-            return {}
+            return []
 
-        visited = set()
-        objects = {}
-        queue = [commit_sha]
+        visited = set(known) if known else set()
+        objects = []
+        queue = deque([commit_sha])
         
-        while queue:
-            sha = queue.pop(0)
-            if sha in visited:
-                continue
-            
-            visited.add(sha)
-            
-            # Validate SHA
-            if not sha or len(sha) < 3:
-                continue
-            
-            # Get object path and ensure its directory exists
-            object_dir = os.path.join(self.pygit.objects_dir, sha[:2])
-            object_path = os.path.join(object_dir, sha[2:])
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            while queue:
+                # Take every object discovered so far and read them in parallel
+                batch = []
+                while queue:
+                    sha = queue.popleft()
+                    if sha in visited:
+                        continue
+                    
+                    visited.add(sha)
+                    
+                    # Validate SHA
+                    if not sha or len(sha) < 3:
+                        continue
+                    
+                    batch.append(sha)
+                
+                # Merge in discovery order, queueing the referenced objects
+                for result in executor.map(self._read_object_bytes, batch):
+                    if result is None:
+                        continue
+                    sha_bytes, data, refs = result
+                    objects.append((sha_bytes, data))
+                    queue.extend(refs)
+        
+        print(f"Collected {len(objects)} objects to push")
+        return objects
+    
+    def _read_object_bytes(self, sha):
+        """
+        Read an object to push and find the objects it references.
+        
+        Safe to call from worker threads.
+        
+        Blobs reference nothing, so only enough of them is read to find
+        their type and their location on disk is returned in place of the
+        data, to be sent without passing through Python.
+        
+        Args:
+            sha: SHA-1 hash of the object
             
-            if not os.path.exists(object_dir):
-                os.makedirs(object_dir)
+        Returns:
+            tuple: (raw SHA-1, compressed object or its (path, offset,
+                length) on disk, referenced SHA-1s), or None if the object
+                is missing or can't be read
+        """
+        refs = []
+        
+        location = self.pygit.objects.raw_location(sha)
+        if location is None:
+            return None
+        
+        try:
+            sha_bytes = bytes.fromhex(sha)
             
-            if not os.path.exists(object_path):
-                continue
+            # Read the object's compressed data, whether loose or packed
+            path, offset, length = location
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                compressed_data = f.read(min(length, TYPE_PEEK_SIZE))
+                if _is_blob(compressed_data):
+                    return sha_bytes, location, refs
+                compressed_data += f.read(length - len(compressed_data))
             
+            # Try to get object type, but don't fail if we can't
             try:
-                # Read the object file
-                with open(object_path, 'rb') as f:
-                    compressed_data = f.read()
+                # Decompress the data already read instead of reading the object again
+                try:
+                    data = zlib.decompress(compressed_data)
+                    null_index = data.index(b'\0')
+                    obj_type = data[:null_index].split(b' ', 1)[0].decode()
+                    content = data[null_index + 1:]
+                except Exception:
+                    # Fall back to the stored bytes themselves, for objects
+                    # that might be stored in a different format
+                    raw_data = compressed_data
                     
-                # Add to objects dictionary
-                objects[sha] = base64.b64encode(compressed_data).decode()
+                    # Try to determine object type from raw data
+                    if b'tree' in raw_data[:20]:
+                        obj_type = 'tree'
+                        content = raw_data
+                    elif b'commit' in raw_data[:20]:
+                        obj_type = 'commit'
+                        content = raw_data
+                    elif b'blob' in raw_data[:20]:
+                        obj_type = 'blob'
+                        content = raw_data
+                    else:
+                        # If we can't determine type, send it without following it
+                        return sha_bytes, compressed_data, refs
                 
-                # Try to get object type, but don't fail if we can't
-                try:
-                    # Try to use a direct approach to read the object if the normal method fails
+                # If commit, add parent and tree
+                if obj_type == 'commit':
                     try:
-                        obj_type, content = self.pygit.objects.get_object(sha)
+                        content_str = content.decode('utf-8', errors='replace')
+                        for line in content_str.split('\n'):
+                            if line.startswith('parent '):
+                                parent_sha = line.split(' ', 1)[1].strip()
+                                refs.append(parent_sha)
+                            elif line.startswith('tree '):
+                                tree_sha = line.split(' ', 1)[1].strip()
+                                refs.append(tree_sha)
                     except Exception:
-                        # Try to read the object directly from the file
-                        # This is a fallback for objects that might be stored in a different format
-                        with open(object_path, 'rb') as f:
-                            raw_data = f.read()
-                        
-                        # Try to determine object type from raw data
-                        if b'tree' in raw_data[:20]:
-                            obj_type = 'tree'
-                            content = raw_data
-                        elif b'commit' in raw_data[:20]:
-                            obj_type = 'commit'
-                            content = raw_data
-                        elif b'blob' in raw_data[:20]:
-                            obj_type = 'blob'
-                            content = raw_data
+                        pass
+                
+                # If tree, add all referenced objects
+                elif obj_type == 'tree':
+                    try:
+                        # For raw data trees, we need a different parsing approach
+                        if b'tree' in content[:20]:
+                            # This is likely a raw tree format
+                            # Look for SHA-1 patterns (40 hex chars)
+                            matches = _SHA1_RE.findall(content)
+                            
+                            for match in matches:
+                                obj_sha = match.decode('ascii')
+                                if len(obj_sha) == 40:  # Valid SHA-1 is 40 chars
+                                    refs.append(obj_sha)
                         else:
-                            # If we can't determine type, just continue with next object
-                            continue
-                    
-                    # If commit, add parent and tree
-                    if obj_type == 'commit':
-                        try:
-                            content_str = content.decode('utf-8', errors='replace')
-                            for line in content_str.split('\n'):
-                                if line.startswith('parent '):
-                                    parent_sha = line.split(' ', 1)[1].strip()
-                                    queue.append(parent_sha)
-                                elif line.startswith('tree '):
-                                    tree_sha = line.split(' ', 1)[1].strip()
-                                    queue.append(tree_sha)
-                        except Exception:
-                            pass
-                    
-                    # If tree, add all referenced objects
-                    elif obj_type == 'tree':
-                        try:
-                            # For raw data trees, we need a different parsing approach
-                            if b'tree' in content[:20]:
-                                # This is likely a raw tree format
-                                # Look for SHA-1 patterns (40 hex chars)
-                                sha_pattern = re.compile(b'[0-9a-f]{40}')
-                                matches = sha_pattern.findall(content)
-                                
-                                for match in matches:
-                                    obj_sha = match.decode('ascii')
-                                    if len(obj_sha) == 40:  # Valid SHA-1 is 40 chars
-                                        queue.append(obj_sha)
-                            else:
                             # Standard tree format parsing
-                                i = 0
-                                while i < len(content):
-                                    # Find the null byte that separates filename from SHA
-                                    null_pos = content.find(b'\0', i)
-                                    if null_pos == -1:
-                                        break
-                                    
-                                    # Extract SHA (20 bytes after null byte)
-                                    sha_bytes = content[null_pos + 1:null_pos + 21]
-                                    obj_sha = ''.join(f'{b:02x}' for b in sha_bytes)
-                                    queue.append(obj_sha)
-                                    
-                                    # Move to next entry
-                                    i = null_pos + 21
-                        except Exception:
-                            pass
-                    
-                except Exception:
-                    # If we can't process the object, we'll still include it in the push
-                    # but we won't be able to follow its references
-                    continue
+                            refs.extend(_parse_tree_shas(content))
+                    except Exception:
+                        pass
                 
             except Exception:
-                continue
+                # If we can't process the object, we'll still include it in the push
+                # but we won't be able to follow its references
+                pass
+            
+        except Exception:
+            return None
         
-        print(f"Collected {len(objects)} objects to push")
-        return objects
+        return sha_bytes, compressed_data, refs
     
     @staticmethod
     def clone(remote_url, target_dir):
@@ -1,4 +1,21 @@
 import os
+import re
+
+# Matches an "author Name <email>" line in a config file
+_AUTHOR_RE = re.compile(rb'^author (.+?) <(.+?)>\s*$', re.M)
+
+def _read_author(config_path):
+    # One regex pass over the whole file instead of splitting each line
+    try:
+        with open(config_path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None, None
+    
+    m = _AUTHOR_RE.search(data)
+    if not m:
+        return None, None
+    return m.group(1).decode(), m.group(2).decode()
 
 class PyGitUser:
     def __init__(self, pygit_instance):
@@ -12,8 +29,6 @@ class PyGitUser:
     def set_user_info(self, name, email):
         self.user_name = name
         self.user_email = email
-        os.environ['PYGIT_AUTHOR_NAME'] = name
-        os.environ['PYGIT_AUTHOR_EMAIL'] = email
     
     def get_default_user_info(self):
         return self.user_name, self.user_email
@@ -21,20 +36,15 @@ class PyGitUser:
     def set_default_user_info(self, name, email):
         self.user_name = name
         self.user_email = email 
-        os.environ['PYGIT_AUTHOR_NAME'] = name
-        os.environ['PYGIT_AUTHOR_EMAIL'] = email
+    
+    def export_to_env(self):
+        # Only needed to hand the identity to child processes
+        os.environ['PYGIT_AUTHOR_NAME'] = self.user_name
+        os.environ['PYGIT_AUTHOR_EMAIL'] = self.user_email
     
     def get_user_info_from_config(self):
         config_path = os.path.join(self.pygit.root_path, '.pygit', 'config')
-        if not os.path.exists(config_path):
-            return None, None
-        
-        with open(config_path, 'r') as f:
-            for line in f:
-                if line.startswith('author '):
-                    name, email = line.split(' ', 1)[1].strip().split(' <')
-                    return name, email
-        return None, None
+        return _read_author(config_path)
     
     def save_user_info_to_config(self):
         config_path = os.path.join(self.pygit.root_path, '.pygit', 'config')
@@ -43,15 +53,7 @@ class PyGitUser:
     
     def get_user_info_from_git_config(self):
         config_path = os.path.join(self.pygit.root_path, '.git', 'config')
-        if not os.path.exists(config_path):
-            return None, None
-        
-        with open(config_path, 'r') as f:
-            for line in f:
-                if line.startswith('author '):
-                    name, email = line.split(' ', 1)[1].strip().split(' <')
-                    return name, email
-        return None, None
+        return _read_author(config_path)
     
     def save_user_info_to_git_config(self):
         config_path = os.path.join(self.pygit.root_path, '.git', 'config')
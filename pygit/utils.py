@@ -0,0 +1,67 @@
+import os
+
+# On POSIX paths already use forward slashes, so normalizing them is a no-op
+_POSIX = os.sep == '/'
+
+def norm_path(path):
+    """Normalize a relative path to use forward slashes"""
+    return path if _POSIX else path.replace('\\', '/')
+
+def stat_key(path):
+    """Return (mtime_ns, size) for path, or None if it doesn't exist"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+class StatCache:
+    """
+    The parsed contents of a repository file, kept for as long as the
+    file's (mtime_ns, size) is unchanged.
+    
+    The parsed value is shared between callers and must not be modified.
+    """
+    
+    def __init__(self, path, parse):
+        """
+        Args:
+            path: The file to load
+            parse: Called with the file's bytes to produce the cached value
+        """
+        self.path = path
+        self.parse = parse
+        self.key = None
+        self.value = None
+    
+    def load(self):
+        """
+        Return the parsed file, re-reading it only if it changed on disk.
+        
+        Returns:
+            The parsed value, or None if the file doesn't exist
+        """
+        try:
+            with open(self.path, 'rb') as f:
+                stat = os.fstat(f.fileno())
+                key = (stat.st_mtime_ns, stat.st_size)
+                if key == self.key:
+                    return self.value
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        
+        self.value = self.parse(data)
+        self.key = key
+        return self.value
+    
+    def store(self, value):
+        """
+        Record the value a caller just wrote to the file, so the next load
+        doesn't have to re-parse it.
+        
+        Args:
+            value: The parsed form of the file's new contents
+        """
+        self.key = stat_key(self.path)
+        self.value = value
@@ -4,6 +4,11 @@ setup(
     name="pygit",
     version="0.1",
     py_modules=["pygit"],
+    extras_require={
+        're2': ['google-re2'],
+        'orjson': ['orjson'],
+        'msgspec': ['msgspec'],
+    },
     entry_points={
         'console_scripts': [
             'pygit=pygit:main',